@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import re
+import sys
+import timeit
+
+from six.moves.html_parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapbook.filters import CleanText  # noqa: E402
+from scrapbook.utils import unescape  # noqa: E402
+
+
+def legacy_clean_text(value, remove_line_breaks=False):
+    # CleanText before the fast path, kept for comparison.
+    # HTMLParser().unescape only exists up to Python 3.8.
+    value = re.compile(r'<[^>]+>').sub('', value)
+    value = getattr(HTMLParser(), 'unescape', unescape)(value)
+    if remove_line_breaks:
+        value = re.sub(r'(?:\n\r|\r\n|\n|\r)+', ' ', value)
+    value = re.sub(r'[ 　]+', ' ', value)
+    return value.strip()
+
+
+cases = [
+    ('short, clean', ' Alfreds Futterkiste '),
+    ('short, markup', '<p>Alfreds&nbsp;<b>Futterkiste</b>  &amp; co</p>'),
+    ('long, clean', ' '.join(['lorem ipsum dolor sit amet'] * 4000)),
+    ('long, markup', '<p>' + '  '.join(['lorem <b>ipsum</b> &amp;  dolor'] * 4000) + '</p>'),
+]
+
+
+def main():
+    clean_text = CleanText()
+    for name, value in cases:
+        number = 100000 if len(value) < 100 else 100
+        legacy = min(timeit.repeat(lambda: legacy_clean_text(value), number=number, repeat=3))
+        current = min(timeit.repeat(lambda: clean_text(value), number=number, repeat=3))
+        print('{:<16} legacy {:>10.3f} us  current {:>10.3f} us  x{:.1f}'.format(
+            name, legacy / number * 1e6, current / number * 1e6, legacy / current,
+        ))
+
+
+if __name__ == '__main__':
+    main()
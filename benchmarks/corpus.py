@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals
+
+from random import Random
+
+
+words = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud'
+).split()
+
+
+class Corpus(object):
+    # Every page is generated from the seed only, so the same options
+    # always produce the same HTML.
+    def __init__(self, seed=0, items=50, table_rows=50, table_columns=8, text_length=200):
+        self.seed = seed
+        self.items = items
+        self.table_rows = table_rows
+        self.table_columns = table_columns
+        self.text_length = text_length
+        self.random = Random(seed)
+
+    def text(self, length=None):
+        length = self.text_length if length is None else length
+        value = []
+        while sum(len(w) + 1 for w in value) < length:
+            value.append(self.random.choice(words))
+        return ' '.join(value)
+
+    def markup(self, length=None):
+        # Text with inline tags, entities and runs of white space for CleanText.
+        value = []
+        for word in self.text(length).split():
+            choice = self.random.random()
+            if choice < 0.1:
+                word = '<b>{}</b>'.format(word)
+            elif choice < 0.15:
+                word = '{} &amp;'.format(word)
+            elif choice < 0.2:
+                word = '{}\n  '.format(word)
+            value.append(word)
+        return ' '.join(value)
+
+    def date(self):
+        return '{:04}-{:02}-{:02} {:02}:{:02}:{:02}'.format(
+            self.random.randint(2000, 2020), self.random.randint(1, 12),
+            self.random.randint(1, 28), self.random.randint(0, 23),
+            self.random.randint(0, 59), self.random.randint(0, 59),
+        )
+
+    def item(self, index):
+        return (
+            '<div class="item" id="item-{index}">'
+            '<h2 class="title"><a href="/items/{index}">{title}</a></h2>'
+            '<span class="price">{price}</span>'
+            '<span class="stock">{stock}</span>'
+            '<time datetime="{date}">{date}</time>'
+            '<p class="description">{description}</p>'
+            '<ul class="tags">{tags}</ul>'
+            '</div>'
+        ).format(
+            index=index,
+            title=self.text(30),
+            price=self.random.randint(100, 100000),
+            stock=self.random.choice(['yes', 'no']),
+            date=self.date(),
+            description=self.markup(),
+            tags=''.join('<li>{}</li>'.format(self.text(8)) for _ in range(3)),
+        )
+
+    def table(self):
+        rows = ['<tr>{}</tr>'.format(''.join(
+            '<th>column {}</th>'.format(i) for i in range(self.table_columns)
+        ))]
+        for _ in range(self.table_rows):
+            cells = [
+                self.random.choice([self.text(12), self.random.randint(0, 999)])
+                for _ in range(self.table_columns)
+            ]
+            rows.append('<tr>{}</tr>'.format(''.join('<td> {} </td>'.format(c) for c in cells)))
+        return '<table class="specs">{}</table>'.format(''.join(rows))
+
+    def definition_list(self):
+        return '<dl class="details">{}</dl>'.format(''.join(
+            '<dt>{}</dt><dd>{}</dd>'.format(self.text(10), self.text(20)) for _ in range(10)
+        ))
+
+    def page(self):
+        self.random.seed(self.seed)
+        return (
+            '<html>'
+            '<head><title>{title}</title><meta name="description" content="{title}"></head>'
+            '<body>'
+            '<ol class="breadcrumbs">{breadcrumbs}</ol>'
+            '<h1>{title}</h1>'
+            '<div class="items">{items}</div>'
+            '{table}'
+            '{definition_list}'
+            '<div class="article">{article}</div>'
+            '</body>'
+            '</html>'
+        ).format(
+            title=self.text(40),
+            breadcrumbs=''.join(
+                '<li><a href="/">{}</a></li>'.format(self.text(8)) for _ in range(4)
+            ),
+            items=''.join(self.item(i) for i in range(self.items)),
+            table=self.table(),
+            definition_list=self.definition_list(),
+            article=''.join('<p>{}</p>'.format(self.markup()) for _ in range(20)),
+        )
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+from parsel import Selector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapbook.filters import clean_text  # noqa: E402
+from scrapbook.parsers import ParseTable  # noqa: E402
+
+
+def legacy_parse_table(selector):
+    # ParseTable before the single-pass walker, kept for comparison.
+    rows = selector.xpath('.//tr')
+    keys = [clean_text(e.xpath('.//text()').extract_first()) for e in rows[0].xpath('./*')]
+    return [
+        {
+            k: clean_text(row.xpath('./*[$index]//text()', index=i + 1).extract_first())
+            for i, k in enumerate(keys)
+        }
+        for row in rows[1:]
+    ]
+
+
+def generate_table(rows, columns):
+    lines = ['<html><body><table>']
+    lines.append('<tr>{}</tr>'.format(''.join('<th>c{}</th>'.format(j) for j in range(columns))))
+    for i in range(rows):
+        lines.append('<tr>{}</tr>'.format(''.join(
+            '<td> {} </td>'.format(i * columns + j) for j in range(columns)
+        )))
+    lines.append('</table></body></html>')
+    return '\n'.join(lines)
+
+
+cases = [
+    ('100x10', 100, 10),
+    ('1000x30', 1000, 30),
+    ('5000x30', 5000, 30),
+]
+
+
+def main():
+    rows_parser = ParseTable(has_header=True)
+    columns_parser = ParseTable(has_header=True, layout='columns')
+    for name, rows, columns in cases:
+        table = Selector(generate_table(rows, columns)).xpath('//table')
+        number = max(1, 10000 // (rows * columns) * 10)
+        legacy = min(timeit.repeat(lambda: legacy_parse_table(table), number=number, repeat=3))
+        current = min(timeit.repeat(lambda: rows_parser(table), number=number, repeat=3))
+        columnar = min(timeit.repeat(lambda: columns_parser(table), number=number, repeat=3))
+        print('{:<8} legacy {:>9.2f} ms  rows {:>8.2f} ms  columns {:>8.2f} ms  x{:.1f}'.format(
+            name, legacy / number * 1e3, current / number * 1e3, columnar / number * 1e3,
+            legacy / current,
+        ))
+
+
+if __name__ == '__main__':
+    main()
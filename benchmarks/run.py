@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+from collections import OrderedDict
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsel import Selector  # noqa: E402
+
+from scrapbook import Content, Element  # noqa: E402
+from scrapbook import filters, parsers  # noqa: E402
+
+from corpus import Corpus  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+basedir = os.path.dirname(os.path.abspath(__file__))
+default_baseline = os.path.join(basedir, 'baseline.json')
+
+cases = OrderedDict()
+
+
+def case(name):
+    def decorator(factory):
+        cases[name] = factory
+        return factory
+    return decorator
+
+
+class Item(Content):
+    title = Element(xpath='./h2/a/text()')
+    url = Element(xpath='./h2/a/@href')
+    price = Element(xpath='./span[@class="price"]/text()', filter=[filters.clean_text, int])
+    stock = Element(xpath='./span[@class="stock"]/text()', filter=filters.Bool('yes'))
+    date = Element(xpath='./time/@datetime', filter=filters.DateTime())
+    description = Element(xpath='./p', parser=parsers.Text())
+    tags = Element(xpath='./ul/li/text()', parser=parsers.All(), filter=filters.through)
+
+
+class Page(Content):
+    title = Element(xpath='//title/text()')
+    breadcrumbs = Element(
+        xpath='//ol[@class="breadcrumbs"]', parser=parsers.ParseList(), filter=filters.through,
+    )
+    items = Item(xpath='//div[@class="item"]', many=True)
+    specs = Element(
+        xpath='//table[@class="specs"]', parser=parsers.ParseTable(has_header=True),
+        filter=filters.through,
+    )
+    details = Element(
+        xpath='//dl[@class="details"]', parser=parsers.ParseDefinitionList(),
+        filter=filters.through,
+    )
+
+
+# The same fields read from the tree and by regexes from the text.
+class Summary(Content):
+    title = Element(xpath='//title/text()')
+    description = Element(xpath='//meta[@name="description"]/@content')
+    price = Element(xpath='//span[@class="price"]/text()', filter=[filters.clean_text, int])
+    date = Element(xpath='//time/@datetime')
+
+
+class TextSummary(Content):
+    title = Element(regex=r'<title>([^<]*)</title>')
+    description = Element(regex=r'<meta name="description" content="([^"]*)"')
+    price = Element(regex=r'<span class="price">(\d+)</span>', filter=int)
+    date = Element(regex=r'<time datetime="([^"]*)"')
+
+
+# Documents
+
+@case('element.parse')
+def element_parse(corpus):
+    element = Element(xpath='//h1/text()')
+    return lambda: element.parse(corpus.selector)
+
+
+@case('content.parse')
+def content_parse(corpus):
+    content = Item(xpath='//div[@class="item"]')
+    return lambda: content.parse(corpus.selector)
+
+
+@case('content.parse.many')
+def content_parse_many(corpus):
+    content = Item(xpath='//div[@class="item"]', many=True)
+    return lambda: content.parse(corpus.selector)
+
+
+@case('content.parse.nested')
+def content_parse_nested(corpus):
+    content = Page()
+    return lambda: content.parse(corpus.selector)
+
+
+@case('content.parse.text')
+def content_parse_text(corpus):
+    content = Page()
+    return lambda: content.parse(corpus.html)
+
+
+@case('content.parse.bytes')
+def content_parse_bytes(corpus):
+    content = Page()
+    data = corpus.html.encode('utf-8')
+    return lambda: content.parse(data)
+
+
+@case('content.parse.summary')
+def content_parse_summary(corpus):
+    content = Summary()
+    return lambda: content.parse(corpus.html)
+
+
+@case('content.parse.regex')
+def content_parse_regex(corpus):
+    content = TextSummary()
+    return lambda: content.parse(corpus.html)
+
+
+# Filters are called on a batch of values from the corpus per operation.
+
+def filter_case(name, filter, values):
+    @case('filters.' + name)
+    def factory(corpus):
+        fn = filter() if inspect.isclass(filter) else filter
+        batch = values(corpus)
+        return lambda: [fn(v) for v in batch]
+
+
+def select(expr):
+    return lambda corpus: corpus.selector.xpath(expr).extract()[:100]
+
+
+def texts(corpus):
+    return select('//div[@class="item"]/p')(corpus)
+
+
+def lists(corpus):
+    return [v.split() for v in select('//div[@class="item"]/p/text()')(corpus)]
+
+
+def dicts(corpus):
+    return [{'a': v, 'b': v, 'c': v} for v in select('//h2/a/text()')(corpus)]
+
+
+filter_case('through', filters.through, texts)
+filter_case('take_first', filters.take_first, lists)
+filter_case('clean_text', filters.CleanText, texts)
+filter_case('clean_text.remove_line_breaks', filters.CleanText(remove_line_breaks=True), texts)
+filter_case('equals', filters.Equals('yes'), select('//span[@class="stock"]/text()'))
+filter_case('contains', filters.Contains('lorem'), texts)
+filter_case('fetch', filters.Fetch(r'/items/(\d+)'), select('//h2/a/@href'))
+filter_case('fetch.all', filters.Fetch(r'\w+', all=True), texts)
+filter_case('replace', filters.Replace(r'\s+', ' '), texts)
+filter_case('join', filters.Join(' '), lists)
+filter_case('split', filters.Split(' '), texts)
+filter_case('normalize', filters.Normalize(), texts)
+filter_case('rename_key', filters.RenameKey({'a': 'x'}), dicts)
+filter_case('filter_dict', filters.FilterDict(['a', 'b']), dicts)
+filter_case(
+    'partial', filters.Partial(int, kwargs={'base': 16}), select('//span[@class="price"]/text()'),
+)
+filter_case('datetime', filters.DateTime, select('//time/@datetime'))
+filter_case('datetime.uncached', filters.DateTime(cache_size=0), select('//time/@datetime'))
+filter_case('bool', filters.Bool('yes'), select('//span[@class="stock"]/text()'))
+filter_case('map', filters.Map(filters.clean_text, len), lists)
+
+
+# Parsers
+
+def parser_case(name, parser, expr):
+    @case('parsers.' + name)
+    def factory(corpus):
+        selector = corpus.selector.xpath(expr)
+        return lambda: parser(selector)
+
+
+parser_case('first', parsers.First(), '//div[@class="item"]/h2/a/text()')
+parser_case('all', parsers.All(), '//div[@class="item"]/h2/a/text()')
+parser_case('text', parsers.Text(), '//div[@class="article"]')
+parser_case('text.all', parsers.Text(all=True), '//div[@class="article"]/p')
+table = '//table[@class="specs"]'
+parser_case('parse_table', parsers.ParseTable(), table)
+parser_case('parse_table.has_header', parsers.ParseTable(has_header=True), table)
+parser_case('parse_table.columns', parsers.ParseTable(layout='columns'), table)
+parser_case('parse_list', parsers.ParseList(), '//ul[@class="tags"]')
+parser_case('parse_definition_list', parsers.ParseDefinitionList(), '//dl[@class="details"]')
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def measure(fn, min_time, min_rounds):
+    fn()
+
+    timer = timeit.default_timer
+    samples = []
+    started = timer()
+    while len(samples) < min_rounds or timer() - started < min_time:
+        start = timer()
+        fn()
+        samples.append(timer() - start)
+
+    samples.sort()
+    return OrderedDict([
+        ('rounds', len(samples)),
+        ('ops_per_sec', len(samples) / sum(samples)),
+        ('p50_us', percentile(samples, 0.5) * 1e6),
+        ('p99_us', percentile(samples, 0.99) * 1e6),
+    ])
+
+
+def run_case(name, options, engine, min_time, min_rounds):
+    Content.engine = engine
+    corpus = Corpus(**options)
+    corpus.html = corpus.page()
+    corpus.selector = Selector(text=corpus.html)
+
+    result = measure(cases[name](corpus), min_time, min_rounds)
+    result['peak_rss_kb'] = peak_rss()
+    return result
+
+
+def run(names, options, engine, min_time, min_rounds):
+    # Each case runs in its own process so that the peak RSS is its own.
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        results = OrderedDict()
+        for name in names:
+            results[name] = pool.apply(
+                run_case, (name, options, engine, min_time, min_rounds),
+            )
+            print('{:<40} {:>12.1f} ops/s  p50 {:>10.1f} us  p99 {:>10.1f} us'.format(
+                name, results[name]['ops_per_sec'], results[name]['p50_us'],
+                results[name]['p99_us'],
+            ), file=sys.stderr)
+        return results
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['ops_per_sec'] / baseline['results'][name]['ops_per_sec']
+        result['baseline_ratio'] = ratio
+        if ratio < 1 - threshold:
+            regressions.append(name)
+        print('{:<40} x{:.2f}{}'.format(
+            name, ratio, '  REGRESSION' if name in regressions else '',
+        ), file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the scrapbook benchmarks.')
+    parser.add_argument('names', nargs='*', help='run only cases starting with these names')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--table-rows', type=int, default=50)
+    parser.add_argument('--table-columns', type=int, default=8)
+    parser.add_argument('--text-length', type=int, default=200)
+    parser.add_argument('--engine', choices=['interpreted', 'compiled'], default='interpreted',
+                        help='the engine of the Content cases')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds per case')
+    parser.add_argument('--min-rounds', type=int, default=20)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', nargs='?', const=default_baseline,
+                        help='compare against this results file (default: baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown against the baseline reported as regression')
+    parser.add_argument('--list', action='store_true', help='list the cases')
+    args = parser.parse_args(argv)
+
+    names = [n for n in cases if not args.names or n.startswith(tuple(args.names))]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    options = {
+        'seed': args.seed,
+        'items': args.items,
+        'table_rows': args.table_rows,
+        'table_columns': args.table_columns,
+        'text_length': args.text_length,
+    }
+    report = OrderedDict([
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('corpus', options),
+        ('engine', args.engine),
+        ('results', run(names, options, args.engine, args.min_time, args.min_rounds)),
+    ])
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        if baseline['corpus'] != options:
+            print('The corpus options differ from the baseline.', file=sys.stderr)
+        regressions = compare(report['results'], baseline, args.threshold)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output + '\n')
+    else:
+        print(output)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,13 +3,27 @@ from __future__ import absolute_import, print_function
 
 from collections import MutableMapping
 import inspect
+import types
 import six
 from parsel import Selector
 
-from .exceptions import ScrapBookError
+from . import codegen, profiling
+from .batch import parse_many
+from .document import Document, parse_all  # noqa: F401
+from .exceptions import ScrapBookError  # noqa: F401
 from .filters import clean_text, Filter, through
-from .parsers import First
-from .utils import merge_dict
+from .parsers import All, clean_plain_text, First, Text
+from .plan import (
+    as_tuple, bind_element, bind_fields, ContentPlan, ElementPlan, has_opaque, OpaquePlan,
+    RegexPlan, text_regexes,
+)
+from .profiling import profile, Stats  # noqa: F401
+from .records import iter_items, RecordClass
+from .regex import NodeScan, Regex, Scan
+from .source import is_source, load_selector, load_text
+from .stream import iterparse
+from .utils import LRUCache, merge_dict, overrides
+from .xpath import select, XPath
 
 
 class BaseElement(object):
@@ -20,10 +34,17 @@ class BaseElement(object):
         self.xpath = xpath
         if filter:
             self.filter = filter
+        self._compiled = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        return state
 
     def __get__(self, instance, owner):
-        self.instance = instance
-        return self
+        if instance is None:
+            return self
+        return bind_element(self, instance)
 
     @property
     def is_descriptor(self):
@@ -31,8 +52,7 @@ class BaseElement(object):
 
     def get_function(self, fn):
         if isinstance(fn, Filter):
-            fn.element = self
-            return fn
+            return fn.bind(self)
 
         if callable(fn):
             return fn
@@ -54,11 +74,32 @@ class BaseElement(object):
 
         return [self.get_function(f) for f in filters]
 
+    def to_selector(self, html, encoding=None):
+        # Plans reading the text only get the text, and the tree is never built.
+        if is_source(html) and self.get_plan().reads_text():
+            return load_text(html, encoding)
+        if isinstance(html, six.text_type):
+            return Selector(text=html)
+        if isinstance(html, Document):
+            return html.selector
+        if is_source(html):
+            return load_selector(html, encoding)
+        return html
+
     def get_selector(self, html):
-        selector = Selector(text=html) if isinstance(html, six.string_types) else html
-        if self.xpath:
-            return selector.xpath(self.xpath)
-        return selector.xpath('.')
+        return select(self.to_selector(html), self.xpath or '.')
+
+    def compile(self):
+        return OpaquePlan(self)
+
+    def get_plan(self):
+        if self._compiled is None:
+            self._compiled = self.compile().bind(self)
+        return self.profile_plan(self._compiled)
+
+    def profile_plan(self, plan):
+        stats = profiling.current()
+        return plan if stats is None else stats.get_plan(plan)
 
     def parse(self, html):
         raise NotImplementedError()
@@ -79,42 +120,148 @@ class ContentMeta(type):
                 elements = merge_dict(base.elements, elements)
 
         new_class.elements = elements
+        new_class._plan = tuple(
+            (name, compile_field(element))
+            for name, element in elements.items()
+        )
+        new_class._bound_plan = None
+        if not has_opaque(new_class._plan):
+            try:
+                new_class._bound_plan = bind_fields(new_class._plan, None)
+            except ValueError:
+                pass
 
         return new_class
 
 
+# Inline classes are shared by equal definitions and pickled by their definition.
+_inline_classes = LRUCache(maxsize=256)
+
+
+def inline_class(base, attrs):
+    import pickle
+    try:
+        key = pickle.dumps((base, sorted(attrs.items())), 2)
+    except Exception:
+        key = None
+
+    cls = None if key is None else _inline_classes.get(key)
+    if cls is None:
+        cls = type(str('InlineContent'), (base,), dict(attrs, _inline=(base, attrs)))
+        if key is not None:
+            _inline_classes.set(key, cls)
+    return cls
+
+
+def reduce_content_class(cls):
+    if '_inline' in cls.__dict__:
+        return inline_class, cls._inline
+    return getattr(cls, '__qualname__', cls.__name__)
+
+
+six.moves.copyreg.pickle(ContentMeta, reduce_content_class)
+
+
+def reduce_method(method):
+    # Bound plans keep methods of the Content such as filter='upper'. Python 3
+    # pickles them by name, and so do we on Python 2.
+    return getattr, (six.get_method_self(method), six.get_method_function(method).__name__)
+
+
+if six.PY2:
+    six.moves.copyreg.pickle(types.MethodType, reduce_method)
+
+
 @six.add_metaclass(ContentMeta)
 class Content(BaseElement):
+    engine = 'interpreted'
+
     def __init__(self, *args, **kwargs):
         self.many = kwargs.pop('many', False)
         super(Content, self).__init__(*args, **kwargs)
 
-    def _parse(self, selector):
-        data = {}
-        for name in self.elements:
-            try:
-                data[name] = getattr(self, name).parse(selector)
-            except Exception as e:
-                raise ScrapBookError(parent=e, field=name)
-        return data
-
-    def parse(self, html, object=None):
-        selector = self.get_selector(html)
-        if len(selector) == 0:
+    def compile(self):
+        xpath = XPath(self.xpath or '.')
+        if not self.many:
+            regexes = text_regexes(self._plan)
+            if regexes:
+                # All the fields are regexes, so the text is scanned once for them.
+                xpath = Scan(regexes, None if self.xpath is None else xpath)
+            else:
+                regexes = text_regexes(self._plan, partial=True)
+                if regexes and len(regexes) > 1:
+                    # Others read the tree, and the text of the nodes is shared by the regexes.
+                    xpath = NodeScan(regexes, xpath)
+        return ContentPlan(self, xpath, self.many, as_tuple(self.filter), self._plan)
+
+    def get_plan(self):
+        if self._compiled is None:
+            if self.engine not in ('interpreted', 'compiled'):
+                raise ValueError('{} is not a valid engine.'.format(self.engine))
+            plan = self.compile().bind(self, fields=self._bound_plan)
+            self._compiled = codegen.specialize(plan) if self.engine == 'compiled' else plan
+        return self.profile_plan(self._compiled)
+
+    def parse(self, html, object=None, encoding=None, errors='raise', only=None, exclude=None,
+              lazy=False, record_type='dict', layout='rows', numpy=False):
+        if errors not in ('raise', 'collect'):
+            raise ValueError('{} is not a valid errors.'.format(errors))
+        if record_type not in ('dict', 'slots'):
+            raise ValueError('{} is not a valid record_type.'.format(record_type))
+        if layout not in ('rows', 'columns'):
+            raise ValueError('{} is not a valid layout.'.format(layout))
+        if lazy and (errors == 'collect' or record_type == 'slots'):
+            raise ValueError("lazy=True can not be used with errors='collect' or slots.")
+        if layout == 'columns' and (
+            object is not None or lazy or errors == 'collect' or record_type == 'slots'
+        ):
+            raise ValueError("layout='columns' can only be used with only and exclude.")
+
+        plan = self.get_plan()
+        if only is not None or exclude:
+            plan = plan.project(only, exclude)
+        if layout == 'columns':
+            return plan.parse_columns(self.to_selector(html, encoding), numpy)
+        if lazy:
+            plan = plan.lazy()
+
+        if errors == 'collect':
+            collected = []
+            plan = plan.collect(collected)
+            if record_type == 'slots':
+                plan = plan.with_records()
+            value = plan.parse(self.to_selector(html, encoding))
+            return (None if value is None else self._map_to(value, object)), collected
+
+        if record_type == 'slots':
+            plan = plan.with_records()
+
+        value = plan.parse(self.to_selector(html, encoding))
+        if value is None:
             return None
+        return self._map_to(value, object)
 
-        if self.many:
-            value = [self._parse(s) for s in selector]
-        else:
-            value = self._parse(selector)
+    def iter_parse(self, html, object=None, encoding=None):
+        values = self.get_plan().iterate(self.to_selector(html, encoding))
+        if object is None:
+            return values
+        return (self._map_value(v, object) for v in values)
 
-        for filter in self.get_filter():
-            try:
-                value = filter(value)
-            except Exception as e:
-                raise ScrapBookError(parent=e, selector=selector, value=value)
+    def parse_to(self, html, sink, encoding=None):
+        count = 0
+        plan = self.get_plan()
+        sink.begin(plan)
+        for value in plan.iterate(self.to_selector(html, encoding)):
+            sink.write(value)
+            count += 1
+        return count
 
-        return self._map_to(value, object)
+    def iterparse(self, source, tag, type='html', object=None):
+        for value in iterparse(self.get_plan(), source, tag, type):
+            yield value if object is None else self._map_value(value, object)
+
+    def parse_many(self, documents, workers=None, executor='thread', chunksize=1, ordered=True):
+        return parse_many(self, documents, workers, executor, chunksize, ordered)
 
     def _map_to(self, value, object):
         if object is None:
@@ -129,47 +276,68 @@ class Content(BaseElement):
             object = object()
 
         if isinstance(object, MutableMapping):
-            for k, v in value.items():
+            for k, v in iter_items(value):
                 object[k] = v
             return object
 
-        for k, v in value.items():
+        for k, v in iter_items(value):
             setattr(object, k, v)
         return object
 
     @classmethod
     def inline(base, xpath=None, filter=None, **attrs):
-        cls = type('InlineContent', (base,), attrs)
-        return cls(xpath, filter)
+        return inline_class(base, attrs)(xpath, filter)
+
+
+# Set after the class body, which ContentMeta reads the elements from.
+Content.record_class = RecordClass()
 
 
 class Element(BaseElement):
     filter = (clean_text,)
     parser = First()
+    regex = None
 
     def __init__(self, *args, **kwargs):
         parser = kwargs.pop('parser', None)
         if parser:
             self.parser = parser
+        regex = kwargs.pop('regex', None)
+        if regex:
+            self.regex = regex
         super(Element, self).__init__(*args, **kwargs)
+        if isinstance(self.parser, Text) and self.filter is Element.filter:
+            # The text is already unescaped, so it is not taken for markup again.
+            self.filter = (clean_plain_text,)
 
     def get_parser(self):
         return self.get_function(self.parser)
 
-    def _parse(self, selector):
-        return self.get_parser()(selector)
-
-    def parse(self, html):
-        selector = self.get_selector(html)
-        if len(selector) == 0:
-            return None
-
-        value = None
-        try:
-            value = self._parse(selector)
-            for filter in self.get_filter():
-                value = filter(value)
-        except Exception as e:
-            raise ScrapBookError(parent=e, selector=selector, value=value)
-
-        return value
+    def compile(self):
+        if self.regex is not None:
+            if type(self.parser) not in (First, All):
+                raise ValueError('regex can only be used with the First or All parser.')
+            return RegexPlan(
+                self,
+                None if self.xpath is None else XPath(self.xpath),
+                Regex(self.regex, all=type(self.parser) is All),
+                as_tuple(self.filter),
+            )
+
+        # First needs one match only, so the XPath stops at it.
+        xpath = XPath(self.xpath or '.', first=type(self.parser) is First)
+        return ElementPlan(self, xpath, self.parser, as_tuple(self.filter))
+
+    def parse(self, html, encoding=None):
+        return self.get_plan().parse(self.to_selector(html, encoding))
+
+
+def compile_field(element):
+    hooks = ('parse', 'get_selector', 'get_filter', 'get_function')
+    if isinstance(element, Content):
+        native = not overrides(element, Content, *hooks)
+    elif isinstance(element, Element):
+        native = not overrides(element, Element, 'get_parser', *hooks)
+    else:
+        native = False
+    return element.compile() if native else OpaquePlan(element)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from collections import namedtuple
+import functools
+import threading
+
+
+ParseResult = namedtuple('ParseResult', ['index', 'value', 'error'])
+
+_worker_content = None
+
+
+def _init_worker(content):
+    global _worker_content
+    _worker_content = content
+
+
+def _parse_document(content, item):
+    index, document = item
+    try:
+        return ParseResult(index, content.parse(document), None)
+    except Exception as e:
+        return ParseResult(index, None, e)
+
+
+def _parse_in_process(item):
+    result = _parse_document(_worker_content, item)
+    if result.error is None:
+        return result
+
+    import pickle
+    try:
+        pickle.dumps(result.error)
+    except Exception:
+        error = RuntimeError('{}: {}'.format(result.error.__class__.__name__, result.error))
+        result = result._replace(error=error)
+    return result
+
+
+def parse_many(content, documents, workers=None, executor='thread', chunksize=1, ordered=True):
+    if executor not in ('thread', 'process'):
+        raise ValueError('{} is not a valid executor.'.format(executor))
+    # multiprocessing is imported on first use to keep it out of import scrapbook.
+    import multiprocessing
+    workers = workers or multiprocessing.cpu_count()
+    return _parse_many(content, documents, workers, executor, chunksize, ordered)
+
+
+def _parse_many(content, documents, workers, executor, chunksize, ordered):
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+
+    if executor == 'thread':
+        pool = ThreadPool(workers)
+        parse = functools.partial(_parse_document, content)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(content, ))
+        parse = _parse_in_process
+
+    # Pool.imap reads the whole input up front, so keep only a few chunks
+    # per worker in flight to stream documents through.
+    semaphore = threading.Semaphore(workers * chunksize * 2)
+    closed = threading.Event()
+
+    def feed():
+        for item in enumerate(documents):
+            semaphore.acquire()
+            if closed.is_set():
+                return
+            yield item
+
+    imap = pool.imap if ordered else pool.imap_unordered
+    try:
+        for result in imap(parse, feed(), chunksize):
+            semaphore.release()
+            yield result
+    finally:
+        closed.set()
+        semaphore.release()
+        pool.terminate()
+        pool.join()
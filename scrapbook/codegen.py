@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import six
+
+from .exceptions import ScrapBookError
+from .filters import Through
+from .plan import ContentPlan, ElementPlan
+from .utils import LRUCache
+
+
+# Plans of the same shape share one code object, only their namespaces differ.
+code_cache = LRUCache(maxsize=256)
+
+
+def generate_source(fields, record=False):
+    namespace = {'ScrapBookError': ScrapBookError}
+    lines = ['def parse_fields(selector):', '    data = {}']
+
+    for i, (name, plan) in enumerate(fields):
+        lines.append('    try:')
+        if type(plan) is ElementPlan:
+            namespace['xpath_{}'.format(i)] = plan.xpath
+            namespace['parser_{}'.format(i)] = plan.parser
+            lines.extend([
+                '        nodes = xpath_{}(selector)'.format(i),
+                '        if len(nodes) == 0:',
+                '            data[{!r}] = None'.format(name),
+                '        else:',
+                '            value = None',
+                '            try:',
+                '                value = parser_{}(nodes)'.format(i),
+            ])
+            for j, filter in enumerate(plan.filters):
+                # Through returns its value as is, so it is left out of the chain.
+                if type(filter) is Through:
+                    continue
+                namespace['filter_{}_{}'.format(i, j)] = filter
+                lines.append('                value = filter_{}_{}(value)'.format(i, j))
+            lines.extend([
+                '            except Exception as e:',
+                '                raise ScrapBookError(parent=e, selector=nodes, value=value)',
+                '            data[{!r}] = value'.format(name),
+            ])
+        else:
+            namespace['plan_{}'.format(i)] = plan.parse
+            lines.append('        data[{!r}] = plan_{}(selector)'.format(name, i))
+        lines.extend([
+            '    except Exception as e:',
+            '        raise ScrapBookError(parent=e, field={!r})'.format(name),
+        ])
+
+    lines.append('    return make_record(data)' if record else '    return data')
+    return '\n'.join(lines) + '\n', namespace
+
+
+def compile_fields(fields, record_class=None):
+    source, namespace = generate_source(fields, record_class is not None)
+    code = code_cache.get(source)
+    if code is None:
+        code = compile(source, '<scrapbook.codegen>', 'exec')
+        code_cache.set(source, code)
+
+    if record_class is not None:
+        namespace['make_record'] = record_class._make
+    six.exec_(code, namespace)
+    return namespace['parse_fields']
+
+
+class CompiledContentPlan(ContentPlan):
+    def __init__(self, element, xpath, many, filters, fields):
+        super(CompiledContentPlan, self).__init__(element, xpath, many, filters, fields)
+        self.parse_fields = compile_fields(self.fields, self.record_class)
+
+    def replace(self, **attrs):
+        plan = super(CompiledContentPlan, self).replace(**attrs)
+        plan.parse_fields = compile_fields(plan.fields, plan.record_class)
+        return plan
+
+
+def specialize(plan):
+    return CompiledContentPlan(
+        plan.element, plan.xpath, plan.many, plan.filters,
+        tuple(
+            (name, specialize(field)) if type(field) is ContentPlan else (name, field)
+            for name, field in plan.fields
+        ),
+    )
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import inspect
+
+from parsel import Selector
+import six
+
+from .source import is_source, load_selector
+from .xpath import select
+
+
+def selector_class(document):
+    # Every selector derived from a document shares its class,
+    # so XPath can find the memo from any node of the tree.
+    return type(str('DocumentSelector'), (Selector, ), {'document': document})
+
+
+class Document(object):
+    def __init__(self, html, type=None, encoding=None):
+        cls = selector_class(self)
+        if isinstance(html, six.text_type):
+            self.selector = cls(text=html, type=type)
+        else:
+            if is_source(html):
+                html = load_selector(html, encoding, type or 'html')
+            self.selector = cls(root=html.root, type=type or html.type, namespaces=html.namespaces)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._memo)
+
+    def xpath(self, expr, **variables):
+        return select(self.selector, expr, **variables)
+
+    def evaluate(self, xpath, selector, variables):
+        key = (
+            id(selector), xpath.expr, xpath.first,
+            tuple(sorted(variables.items())) if variables else (),
+        )
+        entry = self._memo.get(key)
+        if entry is None:
+            # The selector is kept alive with its result so that its id is not reused.
+            entry = self._memo[key] = (selector, xpath._build(selector, variables))
+        return entry[1]
+
+    def clear(self):
+        self._memo.clear()
+
+
+def parse_all(document, contents):
+    if not isinstance(document, Document):
+        document = Document(document)
+
+    return [
+        (content() if inspect.isclass(content) else content).parse(document)
+        for content in contents
+    ]
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
+from collections import namedtuple
 import sys
 import traceback
 
@@ -8,8 +9,10 @@ from parsel import SelectorList
 import six
 
 
-def get_traceback_string():
-    ex_type, ex, tb = sys.exc_info()
+FieldError = namedtuple('FieldError', ['field', 'xpath', 'type', 'error'])
+
+
+def get_traceback_string(tb):
     fp = six.StringIO()
     traceback.print_tb(tb, file=fp)
     fp.seek(0)
@@ -22,14 +25,33 @@ class ScrapBookError(Exception):
         self._selector = selector
         self._value = value
         self._field = field
+        self._message = None
 
-        super(ScrapBookError, self).__init__(self._create_message())
+        # The message is built when it is rendered; only the traceback is kept on Py2.
+        super(ScrapBookError, self).__init__()
         if six.PY3:
             self.with_traceback(parent.__traceback__)
+        else:
+            self._traceback = sys.exc_info()[2]
+
+    def __str__(self):
+        if self._message is None:
+            self._message = self._create_message()
+        return self._message
+
+    def __repr__(self):
+        return '{}({!r}, field={!r})'.format(self.__class__.__name__, self.parent, self.field)
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (self._parent, None, self._value, self._field),
+            {'_xpath': self.xpath},
+        )
 
     def _create_message(self):
         if six.PY2:
-            message = get_traceback_string() + '\n'
+            message = get_traceback_string(getattr(self, '_traceback', None)) + '\n'
         else:
             message = ''
 
@@ -61,7 +83,7 @@ class ScrapBookError(Exception):
     @property
     def xpath(self):
         if not self.selector:
-            return None
+            return getattr(self, '_xpath', None)
 
         if isinstance(self.selector, SelectorList):
             return self.selector[0]._expr
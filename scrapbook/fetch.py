@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+# Python 3.6+ only, import scrapbook.fetch explicitly.
+import asyncio
+from collections import namedtuple
+import os
+import re
+import ssl
+from timeit import default_timer as timer
+from urllib.parse import quote, urljoin, urlsplit
+import zlib
+
+
+FetchResult = namedtuple('FetchResult', ['index', 'url', 'value', 'error'])
+
+charset_pattern = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+# Reserved and already escaped characters are sent as they are.
+safe_chars = "/%:@!$&'()*+,;=~"
+
+retry_statuses = frozenset([429, 500, 502, 503, 504])
+redirect_statuses = frozenset([301, 302, 303, 307, 308])
+
+
+class Response(namedtuple('Response', ['url', 'status', 'headers', 'body'])):
+    __slots__ = ()
+
+    @property
+    def encoding(self):
+        match = charset_pattern.search(self.headers.get('content-type', ''))
+        return match.group(1) if match else None
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or 'utf-8', 'replace')
+
+
+class HTTPError(Exception):
+    def __init__(self, response):
+        self.response = response
+        super(HTTPError, self).__init__('{} {}'.format(response.status, response.url))
+
+
+def parse_response(content, response):
+    return content.parse(response.body, encoding=response.encoding)
+
+
+def decode_body(body, encoding):
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+async def read_body(reader, headers, status):
+    if status in (204, 304) or 100 <= status < 200:
+        return b'', True
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        while True:
+            line = await reader.readline()
+            size = int(line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Trailers end with an empty line.
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks), True
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    if 'content-length' in headers:
+        return await reader.readexactly(int(headers['content-length'])), True
+    return await reader.read(), False
+
+
+async def read_response(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError('Connection closed before the response.')
+    parts = line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ValueError('Invalid status line {!r}.'.format(line))
+    version, status = parts[0], int(parts[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip()
+        headers[name] = '{}, {}'.format(headers[name], value) if name in headers else value
+
+    body, complete = await read_body(reader, headers, status)
+    keep_alive = (
+        complete and version == 'HTTP/1.1'
+        and headers.get('connection', '').lower() != 'close'
+    )
+    return status, headers, decode_body(body, headers.get('content-encoding')), keep_alive
+
+
+def build_request(url, headers):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError('Unsupported URL scheme {!r} in {!r}.'.format(parts.scheme, url))
+    if not parts.hostname:
+        raise ValueError('No host in {!r}.'.format(url))
+
+    hostname = parts.hostname.encode('idna').decode('ascii')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    target = quote(parts.path or '/', safe=safe_chars)
+    if parts.query:
+        target += '?' + quote(parts.query, safe=safe_chars + '?')
+    host = hostname if parts.port is None else '{}:{}'.format(hostname, port)
+
+    lines = ['GET {} HTTP/1.1'.format(target), 'Host: {}'.format(host)]
+    lines.extend('{}: {}'.format(k, v) for k, v in headers.items())
+    return (parts.scheme, hostname, port), ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def exchange(reader, writer, data):
+    writer.write(data)
+    await writer.drain()
+    return await read_response(reader)
+
+
+class ConnectionPool(object):
+    # Keep-alive connections per (scheme, host, port), with at most per_host
+    # requests to a host at a time.
+    def __init__(self, per_host=2, ssl_context=None):
+        self.per_host = per_host
+        self.ssl_context = ssl_context
+        self.connections = 0
+        self._idle = {}
+        self._semaphores = {}
+
+    def semaphore(self, key):
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[key]
+
+    async def connect(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        scheme, host, port = key
+        context = None
+        if scheme == 'https':
+            context = self.ssl_context or ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        self.connections += 1
+        return reader, writer, False
+
+    def release(self, key, reader, writer, keep_alive):
+        if keep_alive:
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class FetchStats(object):
+    def __init__(self):
+        self.started = timer()
+        self.requests = 0
+        self.retries = 0
+        self.pages = 0
+        self.errors = 0
+        self.bytes = 0
+        self.fetch_time = 0.0
+        self.parse_time = 0.0
+        self.max_pages_queue = 0
+        self.max_results_queue = 0
+        self._pages = None
+        self._results = None
+
+    @property
+    def elapsed(self):
+        return timer() - self.started
+
+    @property
+    def pages_per_sec(self):
+        return self.pages / self.elapsed
+
+    @property
+    def pages_queue(self):
+        # Fetched pages waiting for the parse stage.
+        return self._pages.qsize() if self._pages is not None else 0
+
+    @property
+    def results_queue(self):
+        # Parsed pages waiting for the consumer.
+        return self._results.qsize() if self._results is not None else 0
+
+    def watch(self, pages, results):
+        self._pages = pages
+        self._results = results
+
+    def update_queues(self):
+        self.max_pages_queue = max(self.max_pages_queue, self.pages_queue)
+        self.max_results_queue = max(self.max_results_queue, self.results_queue)
+
+    def as_dict(self):
+        return {
+            'elapsed': self.elapsed,
+            'requests': self.requests,
+            'retries': self.retries,
+            'pages': self.pages,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'pages_per_sec': self.pages_per_sec,
+            'fetch_time': self.fetch_time,
+            'parse_time': self.parse_time,
+            'pages_queue': self.pages_queue,
+            'results_queue': self.results_queue,
+            'max_pages_queue': self.max_pages_queue,
+            'max_results_queue': self.max_results_queue,
+        }
+
+
+class Fetcher(object):
+    def __init__(self, content=None, concurrency=10, per_host=2, retries=2, backoff=0.5,
+                 timeout=30.0, queue_size=None, parsers=None, executor=None, headers=None,
+                 max_redirects=5, ssl_context=None):
+        self.content = content
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.queue_size = 2 * concurrency if queue_size is None else queue_size
+        self.parsers = parsers or os.cpu_count() or 1
+        self.executor = executor
+        self.headers = dict({'User-Agent': 'scrapbook', 'Accept-Encoding': 'gzip, deflate'},
+                            **(headers or {}))
+        self.max_redirects = max_redirects
+        self.pool = ConnectionPool(per_host, ssl_context)
+        self.stats = FetchStats()
+
+    async def fetch(self, url):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats.retries += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+
+            try:
+                response = await self.get(url)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                error = e
+                continue
+
+            if response.status in retry_statuses:
+                error = HTTPError(response)
+                retry_after = response.headers.get('retry-after', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                continue
+            if response.status >= 400:
+                raise HTTPError(response)
+            return response
+        raise error
+
+    async def get(self, url):
+        for _ in range(self.max_redirects + 1):
+            status, headers, body = await self.request(url)
+            if status not in redirect_statuses or 'location' not in headers:
+                return Response(url, status, headers, body)
+            url = urljoin(url, headers['location'])
+        raise HTTPError(Response(url, status, headers, body))
+
+    async def request(self, url):
+        key, data = build_request(url, self.headers)
+        async with self.pool.semaphore(key):
+            start = timer()
+            while True:
+                # The connection and TLS handshake are in the timeout as well,
+                # so that an unresponsive host does not hold the worker.
+                reader, writer, reused = await asyncio.wait_for(
+                    self.pool.connect(key), self.timeout,
+                )
+                self.stats.requests += 1
+                try:
+                    status, headers, body, keep_alive = await asyncio.wait_for(
+                        exchange(reader, writer, data), self.timeout,
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # The server may have closed an idle connection, try a new one.
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                break
+
+            self.pool.release(key, reader, writer, keep_alive)
+            self.stats.fetch_time += timer() - start
+            self.stats.bytes += len(body)
+            return status, headers, body
+
+    async def parse(self, response):
+        if self.content is None:
+            return response
+        start = timer()
+        value = await asyncio.get_event_loop().run_in_executor(
+            self.executor, parse_response, self.content, response,
+        )
+        self.stats.parse_time += timer() - start
+        return value
+
+    async def results(self, urls):
+        # URLs are read as fetchers get free, and the bounded queues between the
+        # stages hold the fetchers back when parsing or the consumer is slower.
+        self.stats = FetchStats()
+        urls = enumerate(urls)
+        pages = asyncio.Queue(self.queue_size)
+        results = asyncio.Queue(self.queue_size)
+        self.stats.watch(pages, results)
+
+        async def fetch_worker():
+            for index, url in urls:
+                try:
+                    item = (index, url, await self.fetch(url), None)
+                except Exception as e:
+                    item = (index, url, None, e)
+                await pages.put(item)
+                self.stats.update_queues()
+
+        async def parse_worker():
+            while True:
+                item = await pages.get()
+                if item is None:
+                    return
+                index, url, response, error = item
+                value = None
+                if error is None:
+                    try:
+                        value = await self.parse(response)
+                    except Exception as e:
+                        error = e
+                self.stats.pages += 1
+                self.stats.errors += error is not None
+                await results.put(FetchResult(index, url, value, error))
+                self.stats.update_queues()
+
+        async def run():
+            try:
+                await asyncio.gather(*fetchers)
+                for _ in parsers:
+                    await pages.put(None)
+                await asyncio.gather(*parsers)
+            finally:
+                await results.put(None)
+
+        fetchers = [asyncio.ensure_future(fetch_worker()) for _ in range(self.concurrency)]
+        parsers = [asyncio.ensure_future(parse_worker()) for _ in range(self.parsers)]
+        done = asyncio.ensure_future(run())
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            for task in fetchers + parsers + [done]:
+                task.cancel()
+        await done
+
+    def run(self, urls):
+        async def collect():
+            try:
+                return sorted([r async for r in self.results(urls)], key=lambda r: r.index)
+            finally:
+                self.close()
+        return asyncio.get_event_loop().run_until_complete(collect())
+
+    def close(self):
+        self.pool.close()
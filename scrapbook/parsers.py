@@ -1,7 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
-from .filters import clean_text
+from lxml import etree
+from parsel import SelectorList
+import six
+
+from .filters import clean_text, CleanText
+from .utils import make_array
+from .xpath import select
+
+
+clean_plain_text = CleanText(markup=False)
+
+
+def get_text(selector):
+    root = selector.root
+    if isinstance(root, six.string_types):
+        return root
+    if isinstance(root, etree._Element):
+        return etree.tostring(root, method='text', encoding=six.text_type, with_tail=False)
+    return selector.extract()
 
 
 class First(object):
@@ -14,48 +32,153 @@ class All(object):
         return selector.extract()
 
 
+class Text(object):
+    def __init__(self, all=False):
+        self.all = all
+
+    def __call__(self, selector):
+        if self.all:
+            return [get_text(s) for s in selector]
+        if len(selector) == 0:
+            return None
+        return get_text(selector[0])
+
+
+def get_first_text(element):
+    for text in element.itertext():
+        return text
+    return None
+
+
+def get_span(value, limit):
+    if value is None:
+        return 1
+    try:
+        span = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return min(max(span, 1), limit)
+
+
+def unique_keys(keys):
+    # Header cells repeated by colspan get a suffix, b, b_2, ..., so no column is lost.
+    seen = set()
+    result = []
+    for key in keys:
+        unique, n = key, 1
+        while unique in seen:
+            n += 1
+            unique = u'{}_{}'.format(u'' if key is None else key, n)
+        seen.add(unique)
+        result.append(unique)
+    return result
+
+
 class ParseTable(object):
-    def __init__(self, has_header=False):
+    def __init__(self, has_header=False, layout='rows', numpy=False):
+        if layout not in ('rows', 'columns'):
+            raise ValueError('{} is not a valid layout.'.format(layout))
         self.has_header = has_header
+        self.layout = layout
+        self.numpy = numpy
 
     def __call__(self, selector):
-        rows = selector.xpath('.//tr')
+        rows = list(self.iter_rows(selector))
 
+        if self.layout == 'columns':
+            return self._parse_as_columns(rows)
         if self.has_header:
             return self._parse_as_dict(rows)
-        return self._parse_as_list(rows)
-
-    def _parse_as_list(self, rows):
-        data = []
-        for row in rows:
-            data.append([
-                clean_text(column.xpath('.//text()').extract_first())
-                for column in row.xpath('./*')
-            ])
-
-        return data
+        return rows
+
+    def iter_rows(self, selector):
+        selectors = selector if isinstance(selector, SelectorList) else (selector, )
+        for s in selectors:
+            if isinstance(s.root, etree._Element):
+                for row in self._walk(s.root.iterdescendants('tr')):
+                    yield row
+
+    def _walk(self, rows):
+        # Cells spanning several rows are kept by column index
+        # and filled into the following rows.
+        spans = {}
+        for tr in rows:
+            row = []
+            for cell in tr:
+                if not isinstance(cell.tag, six.string_types):
+                    continue
+                if spans:
+                    self._fill_spans(row, spans)
+                value = clean_text(get_first_text(cell))
+                rowspan = get_span(cell.get('rowspan'), 65534)
+                for _ in range(get_span(cell.get('colspan'), 1000)):
+                    if rowspan > 1:
+                        spans[len(row)] = [value, rowspan - 1]
+                    row.append(value)
+
+            while spans and max(spans) >= len(row):
+                if not self._fill_spans(row, spans):
+                    row.append(None)
+            yield row
+
+    def _fill_spans(self, row, spans):
+        filled = False
+        while len(row) in spans:
+            span = spans[len(row)]
+            row.append(span[0])
+            span[1] -= 1
+            if span[1] == 0:
+                del spans[len(row) - 1]
+            filled = True
+        return filled
 
     def _parse_as_dict(self, rows):
-        keys = [
-            clean_text(e.xpath('.//text()').extract_first())
-            for e in rows[0].xpath('./*')
+        if not rows:
+            return []
+
+        keys = unique_keys(rows[0])
+        return [
+            {k: row[i] if i < len(row) else None for i, k in enumerate(keys)}
+            for row in rows[1:]
         ]
 
-        data = []
-        for row in rows[1:]:
-            data.append({
-                k: clean_text(row.xpath('./*[{}]//text()'.format(i + 1)).extract_first())
-                for i, k in enumerate(keys)
-            })
+    def _parse_as_columns(self, rows):
+        if self.has_header:
+            keys, rows = (unique_keys(rows[0]), rows[1:]) if rows else ([], [])
+        else:
+            keys = list(range(max(len(row) for row in rows) if rows else 0))
 
-        return data
+        columns = [[] for _ in keys]
+        for row in rows:
+            for i, column in enumerate(columns):
+                column.append(row[i] if i < len(row) else None)
+
+        if self.numpy:
+            columns = [to_array(column) for column in columns]
+        return dict(zip(keys, columns))
+
+
+def to_array(values):
+    numbers = []
+    for value in values:
+        if value is None:
+            numbers.append(None)
+            continue
+        try:
+            numbers.append(int(value))
+        except ValueError:
+            try:
+                numbers.append(float(value))
+            except ValueError:
+                return values
+    return make_array(numbers, numpy=True)
 
 
 class ParseList(object):
     def __call__(self, selector):
         return [
             clean_text(v)
-            for v in selector.xpath('./li/text()').extract()
+            for v in select(selector, './li/text()').extract()
         ]
 
 
@@ -63,14 +186,14 @@ class ParseDefinitionList(object):
     def __call__(self, selector):
         data = {}
 
-        for s in selector.xpath('./dt | ./dd'):
-            tag = s.extract()
-            if tag.startswith('<dt>'):
-                current_key = clean_text(tag)
+        for s in select(selector, './dt | ./dd'):
+            text = clean_plain_text(get_text(s))
+            if s.root.tag == 'dt':
+                current_key = text
                 data[current_key] = []
             else:
                 try:
-                    data[current_key].append(clean_text(tag))
+                    data[current_key].append(text)
                 except NameError:
                     pass
 
@@ -0,0 +1,559 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from collections import OrderedDict
+import copy
+from timeit import default_timer as timer
+
+from .exceptions import FieldError, ScrapBookError
+from .filters import Through
+from .profiling import join_path, suspend
+from .records import LazyRecord
+from .regex import Scan, text_of
+from .utils import make_array
+
+
+def as_tuple(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+
+def bind_element(element, instance):
+    bound = copy.copy(element)
+    bound.instance = instance
+    bound._compiled = None
+    return bound
+
+
+def path_tree(paths):
+    # ['a', 'b.c'] -> {'a': None, 'b': {'c': None}}, where None selects the whole field.
+    tree = {}
+    for path in paths:
+        node = tree
+        names = path.split('.')
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+    return tree
+
+
+def text_regexes(fields, partial=False):
+    # The regexes of fields that read the text only. Unless partial, None if a
+    # field needs the tree.
+    regexes = []
+    for _, plan in fields:
+        if isinstance(plan, RegexPlan) and plan.reads_text():
+            regexes.append(plan.regex)
+        elif isinstance(plan, ContentPlan) and plan.reads_text():
+            regexes.extend(plan.xpath.regexes)
+        elif not partial:
+            return None
+    return regexes or None
+
+
+def has_opaque(fields):
+    # Opaque elements resolve their functions when they parse, so they need the instance.
+    for _, plan in fields:
+        if isinstance(plan, OpaquePlan):
+            return True
+        if isinstance(plan, ContentPlan) and has_opaque(plan.fields):
+            return True
+    return False
+
+
+def bind_fields(fields, instance):
+    return tuple(
+        (name, plan.bind(bind_element(plan.element, instance)))
+        for name, plan in fields
+    )
+
+
+class Plan(object):
+    def __init__(self, element):
+        self.element = element
+
+    def bind(self, element):
+        raise NotImplementedError()
+
+    def parse(self, selector):
+        raise NotImplementedError()
+
+    def profile(self, stats, path):
+        raise NotImplementedError()
+
+    def reads_text(self):
+        return False
+
+
+class OpaquePlan(Plan):
+    def bind(self, element):
+        return OpaquePlan(element)
+
+    def parse(self, selector):
+        return self.element.parse(selector)
+
+    def profile(self, stats, path):
+        return ProfiledOpaquePlan(self.element, stats, path)
+
+
+# Elements overriding the parse hooks are timed as a whole.
+class ProfiledOpaquePlan(OpaquePlan):
+    def __init__(self, element, stats, path):
+        self.stats = stats
+        self.path = path
+        super(ProfiledOpaquePlan, self).__init__(element)
+
+    def parse(self, selector):
+        start = timer()
+        value = None
+        try:
+            with suspend():
+                value = self.element.parse(selector)
+        except Exception:
+            self.stats.add(self.path, timer() - start, error=True)
+            raise
+        self.stats.add(self.path, timer() - start, value=value)
+        return value
+
+
+class ElementPlan(Plan):
+    def __init__(self, element, xpath, parser, filters):
+        self.xpath = xpath
+        self.parser = parser
+        self.filters = filters
+        super(ElementPlan, self).__init__(element)
+
+    def bind(self, element):
+        return ElementPlan(
+            element,
+            self.xpath,
+            element.get_function(self.parser),
+            tuple(element.get_function(f) for f in self.filters),
+        )
+
+    def parse(self, selector):
+        selector = self.xpath(selector)
+        if len(selector) == 0:
+            return None
+
+        value = None
+        try:
+            value = self.parser(selector)
+            for filter in self.filters:
+                value = filter(value)
+        except Exception as e:
+            raise ScrapBookError(parent=e, selector=selector, value=value)
+
+        return value
+
+    def profile(self, stats, path):
+        return ProfiledElementPlan(
+            self.element, self.xpath, self.parser, self.filters, stats, path,
+        )
+
+
+class ProfiledElementPlan(ElementPlan):
+    def __init__(self, element, xpath, parser, filters, stats, path):
+        self.stats = stats
+        self.path = path
+        super(ProfiledElementPlan, self).__init__(element, xpath, parser, filters)
+
+    def parse(self, selector):
+        start = timer()
+        selector = self.xpath(selector)
+        xpath_end = timer()
+        if len(selector) == 0:
+            self.stats.add(
+                self.path, xpath_end - start, xpath_time=xpath_end - start, filters=self.filters,
+            )
+            return None
+
+        value = None
+        parser_time = 0.0
+        filter_times = []
+        try:
+            value = self.parser(selector)
+            parser_time = timer() - xpath_end
+            for filter in self.filters:
+                filter_start = timer()
+                value = filter(value)
+                filter_times.append(timer() - filter_start)
+        except Exception as e:
+            self.add(start, xpath_end, parser_time, filter_times, selector, None, True)
+            raise ScrapBookError(parent=e, selector=selector, value=value)
+
+        self.add(start, xpath_end, parser_time, filter_times, selector, value, False)
+        return value
+
+    def add(self, start, xpath_end, parser_time, filter_times, selector, value, error):
+        self.stats.add(
+            self.path, timer() - start,
+            xpath_time=xpath_end - start,
+            parser_time=parser_time,
+            filters=self.filters,
+            filter_times=filter_times,
+            nodes=len(selector),
+            value=value,
+            error=error,
+        )
+
+
+# Regexes run against the text of the nodes, or the document itself without
+# an xpath, and the values of their matches are filtered.
+class RegexPlan(Plan):
+    def __init__(self, element, xpath, regex, filters):
+        self.xpath = xpath
+        self.regex = regex
+        self.filters = filters
+        super(RegexPlan, self).__init__(element)
+
+    def bind(self, element):
+        return RegexPlan(
+            element,
+            self.xpath,
+            self.regex,
+            tuple(element.get_function(f) for f in self.filters),
+        )
+
+    def reads_text(self):
+        return self.xpath is None
+
+    def match(self, source):
+        matches = getattr(source, 'matches', None)
+        if matches is not None and self.regex in matches:
+            return matches[self.regex]
+        if self.xpath is not None:
+            source = self.xpath(source)
+            if len(source) == 0:
+                return None
+        return self.regex(text_of(source))
+
+    def parse(self, source):
+        value = self.match(source)
+        if value is None:
+            return None
+
+        try:
+            for filter in self.filters:
+                value = filter(value)
+        except Exception as e:
+            raise ScrapBookError(parent=e, value=value)
+
+        return value
+
+    def profile(self, stats, path):
+        return ProfiledRegexPlan(self.element, self.xpath, self.regex, self.filters, stats, path)
+
+
+class ProfiledRegexPlan(RegexPlan):
+    def __init__(self, element, xpath, regex, filters, stats, path):
+        self.stats = stats
+        self.path = path
+        super(ProfiledRegexPlan, self).__init__(element, xpath, regex, filters)
+
+    def parse(self, source):
+        start = timer()
+        value = self.match(source)
+        match_end = timer()
+        if value is None:
+            self.stats.add(
+                self.path, match_end - start, parser_time=match_end - start, filters=self.filters,
+            )
+            return None
+
+        filter_times = []
+        try:
+            for filter in self.filters:
+                filter_start = timer()
+                value = filter(value)
+                filter_times.append(timer() - filter_start)
+        except Exception as e:
+            self.add(start, match_end, filter_times, None, True)
+            raise ScrapBookError(parent=e, value=value)
+
+        self.add(start, match_end, filter_times, value, False)
+        return value
+
+    def add(self, start, match_end, filter_times, value, error):
+        self.stats.add(
+            self.path, timer() - start,
+            parser_time=match_end - start,
+            filters=self.filters,
+            filter_times=filter_times,
+            value=value,
+            error=error,
+        )
+
+
+class ContentPlan(Plan):
+    record_class = None
+
+    def __init__(self, element, xpath, many, filters, fields):
+        self.xpath = xpath
+        self.many = many
+        self.filters = filters
+        self.fields = fields
+        super(ContentPlan, self).__init__(element)
+
+    def bind(self, element, fields=None):
+        return ContentPlan(
+            element,
+            self.xpath,
+            self.many,
+            tuple(element.get_function(f) for f in self.filters),
+            fields if fields is not None else bind_fields(self.fields, element),
+        )
+
+    def parse(self, selector):
+        selector = self.xpath(selector)
+        if len(selector) == 0:
+            return None
+
+        if self.many:
+            value = [self.parse_fields(s) for s in selector]
+        else:
+            value = self.parse_fields(selector)
+
+        return self.apply_filters(value, selector)
+
+    def iterate(self, selector):
+        if not self.many or not all(isinstance(f, Through) for f in self.filters):
+            value = self.parse(selector)
+            if value is None:
+                return iter(())
+            return iter(value if self.many else [value])
+        return (self.parse_fields(s) for s in self.xpath.iterate(selector))
+
+    def apply_filters(self, value, selector):
+        for filter in self.filters:
+            try:
+                value = filter(value)
+            except Exception as e:
+                raise ScrapBookError(parent=e, selector=selector, value=value)
+        return value
+
+    def parse_fields(self, selector):
+        data = {}
+        for name, plan in self.fields:
+            try:
+                data[name] = plan.parse(selector)
+            except Exception as e:
+                raise ScrapBookError(parent=e, field=name)
+        return self.make_record(data)
+
+    def parse_columns(self, selector, numpy=False):
+        if not self.is_flat():
+            raise ValueError("layout='columns' can not be used with Content filters.")
+
+        selector = self.xpath(selector)
+        columns = OrderedDict((name, []) for name in self.column_names(''))
+        if len(selector) > 0:
+            for row in selector if self.many else [selector]:
+                self.fill_columns(row, columns, '')
+        return OrderedDict((name, make_array(v, numpy)) for name, v in columns.items())
+
+    def reads_text(self):
+        return isinstance(self.xpath, Scan) and self.xpath.xpath is None
+
+    def is_flat(self):
+        return all(isinstance(f, Through) for f in self.filters)
+
+    def flattens(self, plan):
+        return isinstance(plan, ContentPlan) and not plan.many and plan.is_flat()
+
+    def column_names(self, path):
+        names = []
+        for name, plan in self.fields:
+            if self.flattens(plan):
+                names.extend(plan.column_names(join_path(path, name)))
+            else:
+                names.append(join_path(path, name))
+        return names
+
+    def fill_columns(self, selector, columns, path):
+        # Nested Contents without many or filters are flattened to dotted columns
+        # instead of building a dict for every row.
+        for name, plan in self.fields:
+            column = join_path(path, name)
+            if self.flattens(plan):
+                nested = plan.xpath(selector)
+                if len(nested) > 0:
+                    plan.fill_columns(nested, columns, column)
+                else:
+                    for nested_column in plan.column_names(column):
+                        columns[nested_column].append(None)
+                continue
+
+            try:
+                columns[column].append(plan.parse(selector))
+            except Exception as e:
+                raise ScrapBookError(parent=e, field=column)
+
+    def make_record(self, data):
+        return data if self.record_class is None else self.record_class._make(data)
+
+    def replace(self, **attrs):
+        plan = copy.copy(self)
+        for name, value in attrs.items():
+            setattr(plan, name, value)
+        return plan
+
+    def with_records(self):
+        # Content filters take dicts as usual, so filtered Contents and the ones
+        # in them are not converted.
+        if not self.is_flat():
+            return self
+        return self.replace(
+            record_class=self.element.record_class,
+            fields=tuple(
+                (name, field.with_records()) if isinstance(field, ContentPlan) else (name, field)
+                for name, field in self.fields
+            ),
+        )
+
+    def project(self, only=None, exclude=None):
+        return self._project(
+            None if only is None else path_tree(only), path_tree(exclude or ()), '',
+        )
+
+    def _project(self, only, exclude, path):
+        names = set(name for name, _ in self.fields)
+        for name in list(only or ()) + list(exclude):
+            if name not in names:
+                raise ValueError('{} is not a field.'.format(join_path(path, name)))
+
+        fields = []
+        for name, plan in self.fields:
+            if only is not None and name not in only:
+                continue
+            if name in exclude and exclude[name] is None:
+                continue
+
+            field_only = None if only is None else only[name]
+            field_exclude = exclude.get(name) or {}
+            if field_only is not None or field_exclude:
+                if not isinstance(plan, ContentPlan):
+                    raise ValueError('{} has no fields.'.format(join_path(path, name)))
+                plan = plan._project(field_only, field_exclude, join_path(path, name))
+            fields.append((name, plan))
+
+        return self.replace(fields=tuple(fields))
+
+    def lazy(self):
+        return LazyContentPlan(
+            self.element, self.xpath, self.many, self.filters,
+            tuple(
+                (name, plan.lazy()) if isinstance(plan, ContentPlan) else (name, plan)
+                for name, plan in self.fields
+            ),
+        )
+
+    def collect(self, errors, path=''):
+        return CollectingContentPlan(
+            self.element, self.xpath, self.many, self.filters,
+            tuple(
+                (name, plan.collect(errors, join_path(path, name)))
+                if isinstance(plan, ContentPlan) else (name, plan)
+                for name, plan in self.fields
+            ),
+            errors, path,
+        )
+
+    def profile(self, stats, path):
+        return ProfiledContentPlan(
+            self.element, self.xpath, self.many, self.filters,
+            tuple(
+                (name, plan.profile(stats, join_path(path, name))) for name, plan in self.fields
+            ),
+            stats, path,
+        )
+
+
+class ProfiledContentPlan(ContentPlan):
+    def __init__(self, element, xpath, many, filters, fields, stats, path):
+        self.stats = stats
+        self.path = path
+        super(ProfiledContentPlan, self).__init__(element, xpath, many, filters, fields)
+
+    def parse(self, selector):
+        start = timer()
+        selector = self.xpath(selector)
+        xpath_end = timer()
+        if len(selector) == 0:
+            self.stats.add(
+                self.path, xpath_end - start, xpath_time=xpath_end - start, filters=self.filters,
+            )
+            return None
+
+        value = None
+        filter_times = []
+        try:
+            if self.many:
+                value = [self.parse_fields(s) for s in selector]
+            else:
+                value = self.parse_fields(selector)
+
+            for filter in self.filters:
+                filter_start = timer()
+                try:
+                    value = filter(value)
+                except Exception as e:
+                    raise ScrapBookError(parent=e, selector=selector, value=value)
+                filter_times.append(timer() - filter_start)
+        except Exception:
+            self.add(start, xpath_end, filter_times, selector, None, True)
+            raise
+
+        self.add(start, xpath_end, filter_times, selector, value, False)
+        return value
+
+    def add(self, start, xpath_end, filter_times, selector, value, error):
+        self.stats.add(
+            self.path, timer() - start,
+            xpath_time=xpath_end - start,
+            filters=self.filters,
+            filter_times=filter_times,
+            nodes=len(selector),
+            value=value,
+            error=error,
+        )
+
+
+# Failing fields are set to None and recorded in errors instead of raising.
+class CollectingContentPlan(ContentPlan):
+    def __init__(self, element, xpath, many, filters, fields, errors, path):
+        self.errors = errors
+        self.path = path
+        super(CollectingContentPlan, self).__init__(element, xpath, many, filters, fields)
+
+    def apply_filters(self, value, selector):
+        try:
+            return super(CollectingContentPlan, self).apply_filters(value, selector)
+        except ScrapBookError as e:
+            self.add_error(self.path, e)
+            return None
+
+    def parse_fields(self, selector):
+        data = {}
+        for name, plan in self.fields:
+            try:
+                data[name] = plan.parse(selector)
+            except Exception as e:
+                self.add_error(join_path(self.path, name), e)
+                data[name] = None
+        return self.make_record(data)
+
+    def add_error(self, field, error):
+        if isinstance(error, ScrapBookError):
+            self.errors.append(FieldError(field, error.xpath, error.parent.__class__, error))
+        else:
+            self.errors.append(FieldError(field, None, error.__class__, error))
+
+
+class LazyContentPlan(ContentPlan):
+    def parse_fields(self, selector):
+        return LazyRecord(self.fields, selector)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import sys
+import threading
+
+
+_local = threading.local()
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def profile(stats=None):
+    stats = Stats() if stats is None else stats
+    previous = current()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+@contextmanager
+def suspend():
+    previous = current()
+    _local.stats = None
+    try:
+        yield
+    finally:
+        _local.stats = previous
+
+
+def join_path(path, name):
+    return '{}.{}'.format(path, name) if path else name
+
+
+def get_name(fn):
+    return getattr(fn, '__name__', fn.__class__.__name__)
+
+
+def get_size(value):
+    if value is None:
+        return 0
+    try:
+        return len(value)
+    except TypeError:
+        return 1
+
+
+class FieldStats(object):
+    def __init__(self, filters=()):
+        self.calls = 0
+        self.errors = 0
+        self.time = 0.0
+        self.xpath_time = 0.0
+        self.parser_time = 0.0
+        self.filters = [get_name(f) for f in filters]
+        self.filter_times = [0.0] * len(filters)
+        self.nodes = 0
+        self.size = 0
+        self.max_size = 0
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.time += other.time
+        self.xpath_time += other.xpath_time
+        self.parser_time += other.parser_time
+        if not self.filters:
+            self.filters = list(other.filters)
+            self.filter_times = [0.0] * len(other.filters)
+        for i, t in enumerate(other.filter_times):
+            self.filter_times[i] += t
+        self.nodes += other.nodes
+        self.size += other.size
+        self.max_size = max(self.max_size, other.max_size)
+
+    def as_dict(self):
+        return OrderedDict([
+            ('calls', self.calls),
+            ('errors', self.errors),
+            ('time', self.time),
+            ('xpath_time', self.xpath_time),
+            ('parser_time', self.parser_time),
+            ('filters', [
+                OrderedDict([('name', name), ('time', t)])
+                for name, t in zip(self.filters, self.filter_times)
+            ]),
+            ('nodes', self.nodes),
+            ('size', self.size),
+            ('max_size', self.max_size),
+        ])
+
+
+class Stats(object):
+    def __init__(self):
+        self.fields = OrderedDict()
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, path):
+        return self.fields[path]
+
+    def __contains__(self, path):
+        return path in self.fields
+
+    def get_plan(self, plan):
+        entry = self._plans.get(id(plan))
+        if entry is None:
+            # The plan is kept with its profiled copy so that its id is not reused.
+            entry = self._plans[id(plan)] = (plan, plan.profile(self, ''))
+        return entry[1]
+
+    def add(self, path, time, xpath_time=0.0, parser_time=0.0, filters=(), filter_times=(),
+            nodes=0, value=None, error=False):
+        size = get_size(value)
+        with self._lock:
+            field = self.fields.get(path)
+            if field is None:
+                field = self.fields[path] = FieldStats(filters)
+            field.calls += 1
+            field.errors += error
+            field.time += time
+            field.xpath_time += xpath_time
+            field.parser_time += parser_time
+            for i, t in enumerate(filter_times):
+                field.filter_times[i] += t
+            field.nodes += nodes
+            field.size += size
+            field.max_size = max(field.max_size, size)
+
+    def merge(self, other):
+        with self._lock:
+            for path, field in other.fields.items():
+                self.fields.setdefault(path, FieldStats()).merge(field)
+
+    def clear(self):
+        with self._lock:
+            self.fields.clear()
+
+    def as_dict(self):
+        return OrderedDict((path, field.as_dict()) for path, field in self.fields.items())
+
+    def dump(self, file=None, sort='time', limit=None):
+        file = sys.stdout if file is None else file
+        fields = sorted(self.fields.items(), key=lambda i: getattr(i[1], sort), reverse=True)
+
+        print('{:<40} {:>8} {:>6} {:>10} {:>10} {:>10} {:>10} {:>8} {:>10}'.format(
+            'field', 'calls', 'errors', 'time', 'xpath', 'parser', 'filters', 'nodes', 'size',
+        ), file=file)
+        for path, field in fields[:limit]:
+            print('{:<40} {:>8} {:>6} {:>10.6f} {:>10.6f} {:>10.6f} {:>10.6f} {:>8} {:>10}'.format(
+                path or '<root>', field.calls, field.errors, field.time, field.xpath_time,
+                field.parser_time, sum(field.filter_times), field.nodes, field.size,
+            ), file=file)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from collections import Mapping
+import re
+
+import six
+
+from .exceptions import ScrapBookError
+
+
+identifier_pattern = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def is_identifier(name):
+    return name.isidentifier() if six.PY3 else bool(identifier_pattern.match(name))
+
+
+def make_record_class(content, fields):
+    for name in fields:
+        if not is_identifier(name):
+            raise ValueError(
+                "record_type='slots' needs identifier field names, {} has {!r}.".format(
+                    content.__name__, name,
+                )
+            )
+    return type(
+        str('{}Record'.format(content.__name__)),
+        (Record, ),
+        {'__slots__': tuple(str(f) for f in fields), '_content': content},
+    )
+
+
+class RecordClass(object):
+    # Built per Content class on first use, as only record_type='slots' needs it.
+    def __get__(self, instance, owner):
+        record_class = owner.__dict__.get('_record_class')
+        if record_class is None:
+            record_class = make_record_class(owner, [name for name, _ in owner._plan])
+            owner._record_class = record_class
+        return record_class
+
+
+def restore_record(content, values):
+    return content.record_class._make(values)
+
+
+def as_plain(value):
+    if isinstance(value, Record):
+        return value._asdict()
+    if isinstance(value, list):
+        return [as_plain(v) for v in value]
+    return value
+
+
+def iter_items(value):
+    return value._items() if isinstance(value, Record) else value.items()
+
+
+class Record(object):
+    # Field names never start with '_', so the methods do not collide with them.
+    # Fields left out with only / exclude are not set.
+    __slots__ = ()
+    _content = None
+
+    @classmethod
+    def _make(cls, values):
+        record = cls.__new__(cls)
+        for name, value in six.iteritems(values):
+            setattr(record, name, value)
+        return record
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.__slots__ and hasattr(self, name)
+
+    def __iter__(self):
+        return iter(self._fields())
+
+    def __len__(self):
+        return len(self._fields())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, Mapping)):
+            return dict(self._items()) == dict(iter_items(other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(k, v) for k, v in self._items()
+        ))
+
+    def __reduce__(self):
+        return (restore_record, (self._content, dict(self._items())))
+
+    def _fields(self):
+        return [name for name in self.__slots__ if hasattr(self, name)]
+
+    def _items(self):
+        return [(name, getattr(self, name)) for name in self._fields()]
+
+    def _asdict(self):
+        return {name: as_plain(value) for name, value in self._items()}
+
+
+class LazyRecord(Mapping):
+    # Holds the selector until every field has been read.
+    def __init__(self, fields, selector):
+        self._fields = fields
+        self._plans = dict(fields)
+        self._selector = selector
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            plan = self._plans[name]
+            try:
+                self._values[name] = plan.parse(self._selector)
+            except Exception as e:
+                raise ScrapBookError(parent=e, field=name)
+            if len(self._values) == len(self._plans):
+                self._selector = None
+        return self._values[name]
+
+    def __iter__(self):
+        return (name for name, _ in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(name, self._values[name]) if name in self._values else name
+            for name, _ in self._fields
+        ))
+
+    @property
+    def evaluated(self):
+        return [name for name, _ in self._fields if name in self._values]
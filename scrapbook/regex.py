@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from collections import OrderedDict
+import os
+import re
+
+from parsel import SelectorList
+import six
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+prefix_chars = frozenset(
+    u'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"\'<>=:;,/_-!#%&~@'
+)
+quantifier_chars = frozenset(u'*+?{')
+inline_flags_pattern = re.compile(r'\(\?[aiLmsux]+\)')
+group_refs = (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+
+def match_value(match):
+    groups = match.groupdict()
+    if groups:
+        return groups
+    groups = match.groups()
+    if len(groups) == 1:
+        return groups[0]
+    if groups:
+        return groups
+    return match.group(0)
+
+
+def text_of(source):
+    if isinstance(source, (ScannedText, ScannedSelectorList)) and source.text is not None:
+        return source.text
+    if isinstance(source, six.text_type):
+        return source
+    if isinstance(source, SelectorList):
+        return u''.join(s.extract() for s in source)
+    return source.extract()
+
+
+def refers_groups(parsed):
+    if isinstance(parsed, sre_parse.SubPattern):
+        return any(op in group_refs or refers_groups(av) for op, av in parsed)
+    if isinstance(parsed, (list, tuple)):
+        return any(refers_groups(v) for v in parsed)
+    return False
+
+
+def literal_prefix(pattern):
+    # The leading plain characters of the pattern, which it can be combined on.
+    source = pattern.pattern
+    if not isinstance(source, six.string_types) or pattern.flags & re.VERBOSE:
+        return u''
+    if inline_flags_pattern.search(source):
+        return u''
+
+    size = 0
+    while size < len(source) and source[size] in prefix_chars:
+        size += 1
+    if size < len(source) and source[size] in quantifier_chars:
+        size -= 1
+    if size <= 0:
+        return u''
+
+    try:
+        parsed = sre_parse.parse(source, pattern.flags)
+    except re.error:
+        return u''
+    if refers_groups(parsed) or len(parsed) < size:
+        return u''
+    for i in six.moves.range(size):
+        if tuple(parsed[i]) != (sre_parse.LITERAL, ord(source[i])):
+            return u''
+    return source[:size]
+
+
+def combine(regexes):
+    # Regexes for the first match only that share a literal prefix are searched
+    # in one scan, which stops once all of them matched. Others are searched one
+    # by one, as re finds a single literal prefix much faster than an alternation.
+    buckets = OrderedDict()
+    for regex in regexes:
+        if regex.all:
+            continue
+        prefix = literal_prefix(regex.pattern)
+        if prefix:
+            key = (prefix[0], regex.pattern.flags)
+            buckets.setdefault(key, []).append((prefix, regex))
+
+    scans = []
+    for (_, flags), items in buckets.items():
+        if len(items) < 2:
+            continue
+        common = os.path.commonprefix([prefix for prefix, _ in items])
+        try:
+            source = u'{}(?={})'.format(re.escape(common), u'|'.join(
+                u'(?:{})'.format(regex.pattern.pattern[len(common):]) for _, regex in items
+            ))
+            pattern = re.compile(source, flags)
+        except (re.error, UnicodeDecodeError):
+            # Such as the same group name in two regexes, or non-ASCII str on Python 2.
+            continue
+        scans.append((pattern, tuple(regex for _, regex in items)))
+    return scans
+
+
+class Regex(object):
+    def __init__(self, pattern, all=False):
+        self.pattern = re.compile(pattern)
+        self.all = all
+
+    def __repr__(self):
+        return '<Regex {!r}{}>'.format(self.pattern.pattern, ' all' if self.all else '')
+
+    def __call__(self, text):
+        if self.all:
+            return [match_value(m) for m in self.pattern.finditer(text)] or None
+        match = self.pattern.search(text)
+        return None if match is None else match_value(match)
+
+
+class ScannedText(object):
+    # The text with the values of the regexes combined in a scan.
+    _expr = None
+
+    def __init__(self, text, matches):
+        self.text = text
+        self.matches = matches
+
+    def __len__(self):
+        return 1
+
+
+class ScannedSelectorList(SelectorList):
+    # The nodes with their text and the values of the regexes combined in a scan.
+    # Nodes selected from them are of this class too, without text and matches.
+    text = None
+    matches = None
+
+
+class Scan(object):
+    # Takes the place of the XPath of a Content whose fields are all regexes,
+    # so that the text is read once for all of them.
+    def __init__(self, regexes, xpath=None):
+        self.regexes = tuple(regexes)
+        self.xpath = xpath
+        self.scans = combine(self.regexes)
+
+    def __repr__(self):
+        return '<Scan {} regexes>'.format(len(self.regexes))
+
+    def __call__(self, source):
+        if isinstance(source, ScannedText):
+            return source
+        if self.xpath is None and getattr(source, 'matches', None) is not None:
+            # The text was read by the Content around, which scanned for these regexes too.
+            return ScannedText(source.text, source.matches)
+        if self.xpath is not None:
+            source = self.xpath(source)
+            if len(source) == 0:
+                return source
+        text = text_of(source)
+        return ScannedText(text, self.scan(text))
+
+    def scan(self, text):
+        matches = {}
+        for pattern, regexes in self.scans:
+            pending = list(regexes)
+            position = 0
+            misses = 0
+            # Matches of the regexes already found do not count after a few,
+            # the rest are searched one by one from there.
+            while pending and misses <= len(regexes):
+                match = pattern.search(text, position)
+                if match is None:
+                    position = len(text)
+                    break
+                start = match.start()
+                misses += 1
+                for regex in list(pending):
+                    found = regex.pattern.match(text, start)
+                    if found is not None:
+                        matches[regex] = match_value(found)
+                        pending.remove(regex)
+                        misses = 0
+                position = start + 1
+            for regex in pending:
+                found = regex.pattern.search(text, position)
+                matches[regex] = None if found is None else match_value(found)
+        return matches
+
+
+class NodeScan(Scan):
+    # Takes the place of the XPath of a Content with regex fields among fields
+    # reading the tree, so that the text of its nodes is read once for the regexes
+    # and the other fields get the nodes as usual.
+    def __call__(self, source):
+        nodes = ScannedSelectorList(self.xpath(source))
+        if len(nodes) > 0:
+            nodes.text = text_of(nodes)
+            nodes.matches = self.scan(nodes.text)
+        return nodes
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from array import array
+from collections import Mapping, OrderedDict
+import csv
+from datetime import date, datetime, time
+import gzip
+import io
+import json
+
+import six
+
+from .profiling import join_path
+from .records import iter_items, Record
+
+
+def to_json(value):
+    # DateTime gives datetime or date (truncate_time), written in ISO 8601.
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Record):
+        return dict(value._items())
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (array, tuple, set, frozenset)):
+        return list(value)
+    raise TypeError('{!r} is not JSON serializable.'.format(value))
+
+
+def to_cell(value):
+    if value is None:
+        return u''
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, array, Mapping, Record)):
+        return json.dumps(value, default=to_json, ensure_ascii=False)
+    return value
+
+
+def flatten(record, path='', columns=None):
+    # Nested records become dotted columns, as with layout='columns'.
+    # With the columns of the plan, a nested Content that is None leaves its columns empty.
+    for name, value in iter_items(record):
+        column = join_path(path, name)
+        if columns is not None and column in columns:
+            yield column, value
+        elif isinstance(value, (Mapping, Record)):
+            for item in flatten(value, column, columns):
+                yield item
+        elif value is not None or columns is None:
+            yield column, value
+
+
+class Sink(object):
+    def __init__(self, file, compress=None, buffer_size=64 * 1024, encoding='utf-8'):
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.count = 0
+        self._buffer = []
+        self._size = 0
+
+        if isinstance(file, six.string_types) or hasattr(file, '__fspath__'):
+            path = file.__fspath__() if hasattr(file, '__fspath__') else file
+            compress = path.endswith('.gz') if compress is None else compress
+            self._fp = gzip.open(path, 'wb') if compress else io.open(path, 'wb')
+            self._owned = True
+        elif compress:
+            if isinstance(file, io.TextIOBase):
+                raise ValueError('compress can not be used with a text file.')
+            self._fp = gzip.GzipFile(fileobj=file, mode='wb')
+            self._owned = True
+        else:
+            self._fp = file
+            self._owned = False
+        self._text = isinstance(self._fp, io.TextIOBase)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def begin(self, plan):
+        pass
+
+    def encode(self, record):
+        raise NotImplementedError()
+
+    def write(self, record):
+        data = self.encode(record)
+        self._buffer.append(data)
+        self._size += len(data)
+        self.count += 1
+        if self._size >= self.buffer_size:
+            self._write_buffer()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        self._write_buffer()
+        self._fp.flush()
+
+    def _write_buffer(self):
+        if self._buffer:
+            data = u''.join(self._buffer)
+            self._fp.write(data if self._text else data.encode(self.encoding))
+            self._buffer = []
+            self._size = 0
+
+    def close(self):
+        if self._fp is None:
+            return
+        self.flush()
+        if self._owned:
+            self._fp.close()
+        self._fp = None
+
+
+class JSONLinesSink(Sink):
+    def encode(self, record):
+        return json.dumps(
+            record, default=to_json, ensure_ascii=False, separators=(',', ':'),
+        ) + u'\n'
+
+
+class CSVSink(Sink):
+    def __init__(self, file, fields=None, header=True, dialect='excel', **kwargs):
+        self.fields = fields
+        self.header = header
+        self.columns = None
+        self._row = six.StringIO()
+        self._writer = csv.writer(self._row, dialect=dialect)
+        super(CSVSink, self).__init__(file, **kwargs)
+
+    def begin(self, plan):
+        # The columns of the plan, so that they do not depend on the first record.
+        if plan.is_flat():
+            self.columns = frozenset(plan.column_names(''))
+            if self.fields is None:
+                self.fields = plan.column_names('')
+
+    def encode(self, record):
+        values = OrderedDict(flatten(record, columns=self.columns))
+        lines = []
+        if self.fields is None:
+            self.fields = list(values)
+        if self.header:
+            lines.append(self._encode_row(self.fields))
+            self.header = False
+
+        unknown = set(values) - set(self.fields)
+        if unknown:
+            raise ValueError('{} are not in the fields.'.format(', '.join(sorted(unknown))))
+        lines.append(self._encode_row([to_cell(values.get(f)) for f in self.fields]))
+        return u''.join(lines)
+
+    def _encode_row(self, row):
+        self._row.seek(0)
+        self._row.truncate()
+        if six.PY2:
+            row = [v.encode('utf-8') if isinstance(v, six.text_type) else v for v in row]
+            self._writer.writerow(row)
+            return self._row.getvalue().decode('utf-8')
+        self._writer.writerow(row)
+        return self._row.getvalue()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import codecs
+import itertools
+import mmap
+import re
+import threading
+
+from lxml import etree, html
+from parsel import Selector
+import six
+
+
+chunk_size = 64 * 1024
+
+buffer_types = (bytearray, memoryview, mmap.mmap)
+boms = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'UTF-16LE'),
+    (codecs.BOM_UTF16_BE, 'UTF-16BE'),
+)
+meta_charset_pattern = re.compile(
+    br'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)',
+    re.IGNORECASE,
+)
+
+_encodings = {}
+_local = threading.local()
+
+
+def sniff_bom(head):
+    for bom, encoding in boms:
+        if head.startswith(bom):
+            return bom, encoding
+    return b'', None
+
+
+def sniff_encoding(head):
+    match = meta_charset_pattern.search(head[:1024])
+    if match:
+        encoding = match.group(1).decode('ascii')
+        try:
+            codecs.lookup(encoding)
+            return encoding
+        except LookupError:
+            pass
+    return None
+
+
+def resolve_encoding(encoding):
+    # libxml2 (iconv) and Python name some encodings differently.
+    if encoding not in _encodings:
+        name = None
+        try:
+            candidates = (encoding, codecs.lookup(encoding).name.replace('_', '-'))
+        except LookupError:
+            candidates = (encoding, )
+        for candidate in candidates:
+            try:
+                html.HTMLParser(encoding=candidate)
+                name = candidate
+                break
+            except LookupError:
+                pass
+        _encodings[encoding] = name
+    return _encodings[encoding]
+
+
+def get_parser(type, encoding):
+    # lxml parsers can be reused, but not shared between threads.
+    parsers = getattr(_local, 'parsers', None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+
+    key = (type, encoding)
+    if key not in parsers:
+        if type == 'xml':
+            parsers[key] = etree.XMLParser(recover=True, resolve_entities=False, encoding=encoding)
+        else:
+            parsers[key] = html.HTMLParser(recover=True, encoding=encoding)
+    return parsers[key]
+
+
+def _close(parser):
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return None
+
+
+def _feed(parser, chunks):
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+    except Exception:
+        _close(parser)
+        raise
+    return _close(parser)
+
+
+def iter_chunks(source):
+    if isinstance(source, six.binary_type):
+        yield source
+    elif isinstance(source, buffer_types):
+        # Slice buffers such as mmap chunk by chunk instead of copying them whole.
+        for i in six.moves.range(0, len(source), chunk_size):
+            chunk = source[i:i + chunk_size]
+            yield chunk.tobytes() if isinstance(chunk, memoryview) else bytes(chunk)
+    else:
+        for chunk in iter(lambda: source.read(chunk_size), source.read(0)):
+            yield chunk
+
+
+def decode_chunks(chunks, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', True)
+
+
+def parse_chunks(chunks, encoding=None, type='html'):
+    chunks = iter(chunks)
+    head = next(chunks, b'')
+    if isinstance(head, six.text_type):
+        return Selector(text=head + u''.join(chunks), type=type)
+
+    # Read enough for the BOM and <meta charset> sniffing.
+    while len(head) < 1024:
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        head += chunk
+
+    # A BOM takes precedence over the given encoding, as in browsers.
+    bom, bom_encoding = sniff_bom(head)
+    if bom:
+        head, encoding = head[len(bom):], bom_encoding
+    elif encoding is None:
+        encoding = sniff_encoding(head)
+
+    chunks = itertools.chain([head], chunks)
+    if encoding is None:
+        # Undeclared, read as UTF-8 with invalid bytes replaced, as load_text does.
+        parser = get_parser(type, None)
+        chunks = decode_chunks(chunks, 'utf-8')
+    else:
+        name = resolve_encoding(encoding)
+        if name is None:
+            # Encodings unknown to libxml2 are decoded by Python instead.
+            return Selector(text=b''.join(chunks).decode(encoding), type=type)
+        parser = get_parser(type, name)
+
+    root = _feed(parser, chunks)
+    if root is None:
+        root = etree.fromstring(b'<html/>', parser=parser)
+    return Selector(root=root, type=type)
+
+
+def is_source(value):
+    return (
+        isinstance(value, (six.text_type, six.binary_type) + buffer_types)
+        or hasattr(value, 'read')
+        or hasattr(value, '__fspath__')
+    )
+
+
+def load_selector(source, encoding=None, type='html'):
+    if isinstance(source, six.text_type):
+        return Selector(text=source, type=type)
+
+    if hasattr(source, '__fspath__'):
+        with open(source.__fspath__(), 'rb') as fp:
+            return parse_chunks(iter_chunks(fp), encoding, type)
+    return parse_chunks(iter_chunks(source), encoding, type)
+
+
+def load_text(source, encoding=None):
+    # Decodes the source as the tree parser would, for regexes run without a tree.
+    if isinstance(source, six.text_type):
+        return source
+
+    if hasattr(source, '__fspath__'):
+        with open(source.__fspath__(), 'rb') as fp:
+            return load_text(fp, encoding)
+
+    chunks = list(iter_chunks(source))
+    if chunks and isinstance(chunks[0], six.text_type):
+        return u''.join(chunks)
+
+    data = b''.join(chunks)
+    bom, bom_encoding = sniff_bom(data)
+    if bom:
+        data, encoding = data[len(bom):], bom_encoding
+    elif encoding is None:
+        encoding = sniff_encoding(data)
+    return data.decode(encoding or 'utf-8', 'replace')
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from lxml import etree
+from parsel import Selector
+
+
+def iterparse(plan, source, tag, type='html'):
+    events = etree.iterparse(source, events=('start', 'end'), tag=tag, html=type == 'html')
+    # Items of the tag nested in another one are kept until the outer item ends.
+    depth = 0
+    for event, element in events:
+        if event == 'start':
+            depth += 1
+            continue
+
+        depth -= 1
+        selector = Selector(root=element, type=type)
+        yield plan.apply_filters(plan.parse_fields(selector), selector)
+
+        if depth:
+            continue
+        # Drop the finished item and the items before it, so that the tree
+        # never holds more than what the parser has read ahead.
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
@@ -1,17 +1,109 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
+from array import array
+from collections import namedtuple, OrderedDict
 import re
+import string
+import sys
+import threading
+
 import six
 
+if six.PY3:
+    from html import unescape
+else:
+    def unescape(text):
+        global _html_parser
+        if _html_parser is None:
+            from six.moves.html_parser import HTMLParser
+            _html_parser = HTMLParser()
+        return _html_parser.unescape(text)
+
+
+tag_pattern = re.compile(r'<[^>]+>')
+# array.array has no 'q' on Python 2, where 'l' is 64 bits on most platforms.
+int_typecode = 'q' if six.PY3 else 'l'
+
+_html_parser = None
+_tzinfos = None
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LRUCache(object):
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
 
 def merge_dict(*dicts):
     return six.moves.reduce(lambda a, b: dict(a, **b), dicts)
 
 
+def overrides(obj, base, *names):
+    cls = type(obj)
+    return any(
+        six.get_unbound_function(getattr(cls, name)) is not
+        six.get_unbound_function(getattr(base, name))
+        for name in names
+    )
+
+
 def remove_tags(text):
-    pattern = re.compile(r'<[^>]+>')
-    return pattern.sub('', text)
+    return tag_pattern.sub('', text)
+
+
+shape_table = dict(
+    [(ord(c), u'0') for c in string.digits] +
+    [(ord(c), u'a') for c in string.ascii_letters]
+)
+
+
+def get_shape(text):
+    # Byte strings (str on Python 2) take no translation table of code points.
+    if isinstance(text, six.binary_type):
+        text = text.decode('latin-1')
+    return text.translate(shape_table)
 
 
 def generate_tzinfos():
@@ -77,4 +169,47 @@ def generate_tzinfos():
     return tzinfos
 
 
-tzinfos = generate_tzinfos()
+def get_tzinfos():
+    global _tzinfos
+    if _tzinfos is None:
+        _tzinfos = generate_tzinfos()
+    return _tzinfos
+
+
+# tzinfos is deprecated, use get_tzinfos().
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name == 'tzinfos':
+            return get_tzinfos()
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    # Modules have no __getattr__ before Python 3.7, so the table is built on import.
+    tzinfos = get_tzinfos()
+
+
+def make_array(values, numpy=False):
+    # Columns of bools, ints or floats (with None as nan) become arrays,
+    # any other column is returned as is.
+    types = set(type(v) for v in values)
+    has_none = type(None) in types
+    types.discard(type(None))
+    if not types:
+        return values
+
+    if types == set([bool]) and not has_none:
+        kind = 'bool'
+    elif types <= set(six.integer_types) and not has_none:
+        kind = 'int'
+    elif types <= set(six.integer_types + (float, )):
+        kind = 'float'
+        values = [float('nan') if v is None else v for v in values]
+    else:
+        return values
+
+    try:
+        if numpy:
+            import numpy as np
+            return np.array(values, dtype={'bool': bool, 'int': np.int64, 'float': float}[kind])
+        return array({'bool': 'b', 'int': int_typecode, 'float': 'd'}[kind], values)
+    except OverflowError:
+        return values
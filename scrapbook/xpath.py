@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import sys
+import threading
+
+from lxml import etree
+from parsel import Selector, SelectorList
+import six
+
+from .utils import LRUCache
+
+
+default_namespaces = dict(getattr(Selector, '_default_namespaces', {}))
+
+
+def compile_xpath(expr, namespaces=None):
+    try:
+        return etree.XPath(
+            expr,
+            namespaces=default_namespaces if namespaces is None else namespaces,
+            smart_strings=False,
+        )
+    except etree.XPathError as e:
+        six.reraise(ValueError, ValueError(u'XPath error: {} in {}'.format(e, expr)),
+                    sys.exc_info()[2])
+
+
+# lxml serializes evaluations of one etree.XPath object with a lock,
+# so every thread compiles its own copy of a cached expression.
+class _Entry(threading.local):
+    xpath = None
+
+
+class XPathCache(LRUCache):
+    def get(self, expr, namespaces=None):
+        namespaces = default_namespaces if namespaces is None else namespaces
+        key = (expr, tuple(sorted(namespaces.items())))
+
+        entry = super(XPathCache, self).get(key)
+        if entry is None:
+            entry = _Entry()
+            self.set(key, entry)
+
+        if entry.xpath is None:
+            entry.xpath = compile_xpath(expr, namespaces)
+        return entry.xpath
+
+
+cache = XPathCache()
+
+
+def first_expr(expr):
+    return u'({})[1]'.format(expr)
+
+
+class XPath(threading.local):
+    # With first=True, only the first match is selected, for parsers such as First.
+    def __init__(self, expr, namespaces=None, first=False):
+        self.expr = expr
+        self.namespaces = default_namespaces if namespaces is None else namespaces
+        self.first = first
+        self._xpath = cache.get(first_expr(expr) if first else expr, self.namespaces)
+
+    def __repr__(self):
+        return '<XPath {!r}{}>'.format(self.expr, ' first' if self.first else '')
+
+    def __reduce__(self):
+        return XPath, (self.expr, self.namespaces, self.first)
+
+    def __call__(self, selector, **variables):
+        if isinstance(selector, SelectorList):
+            result = []
+            for s in selector:
+                result.extend(self._evaluate(s, variables))
+            return selector.__class__(result)
+        return selector.selectorlist_cls(self._evaluate(selector, variables))
+
+    def iterate(self, selector, **variables):
+        selectors = selector if isinstance(selector, SelectorList) else (selector, )
+        for s in selectors:
+            if getattr(s, 'document', None) is not None:
+                for x in s.document.evaluate(self, s, variables):
+                    yield x
+                continue
+
+            cls = s.__class__
+            for x in self._nodes(s, variables):
+                yield cls(root=x, _expr=self.expr, namespaces=s.namespaces, type=s.type)
+
+    def _evaluate(self, selector, variables):
+        document = getattr(selector, 'document', None)
+        if document is not None:
+            return document.evaluate(self, selector, variables)
+        return self._build(selector, variables)
+
+    def _build(self, selector, variables):
+        cls = selector.__class__
+        return [
+            cls(root=x, _expr=self.expr, namespaces=selector.namespaces, type=selector.type)
+            for x in self._nodes(selector, variables)
+        ]
+
+    def _nodes(self, selector, variables):
+        if selector.namespaces == self.namespaces:
+            xpath = self._xpath
+        else:
+            xpath = cache.get(first_expr(self.expr) if self.first else self.expr,
+                              selector.namespaces)
+
+        root = selector.root
+        if not hasattr(root, 'xpath'):
+            return []
+
+        try:
+            result = xpath(root, **variables)
+        except etree.XPathEvalError:
+            if not self.first:
+                self._raise()
+            # (expr)[1] may not be valid for expressions that are not node-sets.
+            try:
+                result = cache.get(self.expr, selector.namespaces)(root, **variables)
+            except etree.XPathError:
+                self._raise()
+            if type(result) is list:
+                result = result[:1]
+        except etree.XPathError:
+            self._raise()
+
+        if type(result) is not list:
+            return [result]
+        return result
+
+    def _raise(self):
+        e = sys.exc_info()[1]
+        six.reraise(ValueError, ValueError(u'XPath error: {} in {}'.format(e, self.expr)),
+                    sys.exc_info()[2])
+
+
+def select(selector, expr, **variables):
+    return XPath(expr)(selector, **variables)
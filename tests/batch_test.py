@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import itertools
+
+import pytest
+
+from scrapbook import Content, Element
+from scrapbook.exceptions import ScrapBookError
+from scrapbook.filters import DateTime
+
+
+class Article(Content):
+    title = Element(xpath='//h1/text()')
+    published = Element(xpath='//time/text()', filter=DateTime(truncate_time=True))
+
+
+def make_html(i, date='2017-01-01'):
+    return u'<html><body><h1>title {}</h1><time>{}</time></body></html>'.format(i, date)
+
+
+class TestParseMany(object):
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_(self, executor):
+        documents = [make_html(i) for i in range(20)]
+        article = Article()
+
+        results = list(article.parse_many(documents, workers=2, executor=executor, chunksize=3))
+
+        assert list(range(20)) == [r.index for r in results]
+        assert [article.parse(d) for d in documents] == [r.value for r in results]
+        assert all(r.error is None for r in results)
+
+    def test_unordered(self):
+        documents = [make_html(i) for i in range(20)]
+        results = list(Article().parse_many(documents, workers=4, ordered=False))
+        assert list(range(20)) == sorted(r.index for r in results)
+
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_with_error(self, executor):
+        documents = [make_html(0), make_html(1, date='aaaa'), make_html(2)]
+
+        results = list(Article().parse_many(documents, workers=2, executor=executor))
+
+        assert [None, None, None] == [results[0].error, results[1].value, results[2].error]
+        assert isinstance(results[1].error, ScrapBookError)
+        assert 'published' == results[1].error.field
+        assert '//time/text()' == results[1].error.xpath
+
+    def test_stop_early(self):
+        documents = (make_html(i) for i in itertools.count())
+        results = Article().parse_many(documents, workers=2)
+
+        assert [0, 1, 2] == [r.index for r in itertools.islice(results, 3)]
+        results.close()
+
+    def test_invalid_executor(self):
+        with pytest.raises(ValueError):
+            Article().parse_many([], executor='fiber')
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from scrapbook import Content, Element, profile
+from scrapbook.codegen import code_cache, CompiledContentPlan, generate_source
+from scrapbook.exceptions import ScrapBookError
+from scrapbook.filters import through
+
+
+html = u'''
+<html>
+    <body>
+        <h1>Title</h1>
+        <div class="item"><span>1</span><a href="/a">a</a></div>
+        <div class="item"><span>2</span><a href="/b">b</a></div>
+    </body>
+</html>
+'''
+
+
+class Item(Content):
+    engine = 'compiled'
+    number = Element(xpath='./span/text()', filter=[through, int])
+    url = Element(xpath='./a/@href')
+
+
+class Overridden(Element):
+    def parse(self, html):
+        return 'overridden'
+
+
+class Page(Content):
+    engine = 'compiled'
+    title = Element(xpath='//h1/text()')
+    items = Item(xpath='//div[@class="item"]', many=True)
+    overridden = Overridden()
+
+
+expected = {
+    'title': 'Title',
+    'items': [{'number': 1, 'url': '/a'}, {'number': 2, 'url': '/b'}],
+    'overridden': 'overridden',
+}
+
+
+class TestCompiledEngine(object):
+    def test_parse(self):
+        assert Page().parse(html) == expected
+
+    def test_plan(self):
+        plan = Page().get_plan()
+        assert isinstance(plan, CompiledContentPlan)
+        assert isinstance(dict(plan.fields)['items'], CompiledContentPlan)
+
+    def test_generated_source(self):
+        fields = Item().get_plan().fields
+        i = [name for name, _ in fields].index('number')
+        source, namespace = generate_source(fields)
+        assert 'value = parser_{}(nodes)'.format(i) in source
+        assert 'filter_{}_0'.format(i) not in source
+        assert 'value = filter_{}_1(value)'.format(i) in source
+        assert source.endswith('    return data\n')
+        assert namespace['filter_{}_1'.format(i)] is int
+
+    def test_overridden_element_is_called(self):
+        fields = Page().get_plan().fields
+        i = [name for name, _ in fields].index('overridden')
+        source, namespace = generate_source(fields)
+        assert "data['overridden'] = plan_{}(selector)".format(i) in source
+
+    def test_code_is_shared(self):
+        Item().parse(html)
+        misses = code_cache.misses
+        Item().parse(html)
+        Item(xpath='//div[@class="item"]', many=True).parse(html)
+        assert code_cache.misses == misses
+
+    def test_error(self):
+        with pytest.raises(ScrapBookError) as e:
+            Page().parse(html.replace('<span>2</span>', '<span>x</span>'))
+        assert e.value.field == 'items.number'
+        assert e.value.value == 'x'
+
+    def test_options(self):
+        page = Page()
+        assert page.parse(html, only=['items.url']) == {'items': [{'url': '/a'}, {'url': '/b'}]}
+        assert page.parse(html, record_type='slots')._asdict()['title'] == 'Title'
+        assert page.parse(html, lazy=True)['title'] == 'Title'
+        assert page.parse(html, errors='collect') == (expected, [])
+
+    def test_profile(self):
+        with profile() as stats:
+            assert Page().parse(html) == expected
+        assert stats['items.number'].calls == 2
+
+    def test_invalid_engine(self):
+        class Invalid(Content):
+            engine = 'jit'
+            title = Element(xpath='//h1/text()')
+
+        with pytest.raises(ValueError):
+            Invalid().parse(html)
@@ -4,4 +4,17 @@ from __future__ import unicode_literals, print_function
 import os
 import sys
 
+import pytest
+
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+@pytest.fixture(params=['interpreted', 'compiled'])
+def engine(request, monkeypatch):
+    from scrapbook import Content
+    monkeypatch.setattr(Content, 'engine', request.param)
+    return request.param
+
+
+# scrapbook.fetch uses asyncio and async generators.
+collect_ignore = ['fetch_test.py'] if sys.version_info < (3, 6) else []
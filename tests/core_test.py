@@ -1,15 +1,38 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
+from array import array
 from collections import OrderedDict
+import io
+import itertools
+import pickle
+import threading
+import types
 
 from parsel import Selector
+import pytest
 
 from scrapbook import (
     BaseElement,
     Content,
     Element,
 )
+from scrapbook.filters import clean_text, Map, RenameKey, through
+from scrapbook.parsers import All, Text
+from scrapbook.utils import int_typecode
+
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+
+class SlottedItem(Content):
+    name = Element(xpath='./span/text()')
+    price = Element(xpath='./b/text()', filter=int)
+
+
+class SlottedPage(Content):
+    title = Element(xpath='//h1/text()')
+    items = SlottedItem(xpath='//li', many=True)
 
 
 class TestBaseElement(object):
@@ -21,6 +44,19 @@ class TestBaseElement(object):
             element = BaseElement()
 
         assert A().element.is_descriptor
+        assert not A.element.is_descriptor
+
+    def test_get_function_does_not_modify_shared_objects(self):
+        class A(BaseElement):
+            element = BaseElement()
+
+        a = A()
+        bound = a.element.get_function(clean_text)
+
+        assert bound.element.instance is a
+        assert bound is not clean_text
+        assert clean_text.element is None
+        assert A.element.instance is None
 
     def test_get_function(self, mocker):
         def fn1(value):
@@ -193,6 +229,371 @@ class TestContent(object):
             'el2': 'http://google.com',
         }
 
+    def test_plan(self):
+        class A(Content):
+            el1 = Element(xpath='/html/body/p/a/text()')
+            el2 = Element(xpath='/html/body/p/a/@href', filter='upper')
+
+            def upper(self, value):
+                return value.upper()
+
+        class B(Content):
+            el1 = Element(xpath='/html/body/p/a/text()')
+
+        assert ['el1', 'el2'] == sorted(name for name, _ in A._plan)
+        assert A._bound_plan is None
+        assert B._bound_plan is not None
+
+        a = A()
+        assert a.get_plan() is a.get_plan()
+
+    def test_invalid_xpath(self):
+        with pytest.raises(ValueError):
+            class A(Content):
+                el1 = Element(xpath='/html/body/p[')
+
+    def test_parse_with_overridden_element(self):
+        html = u'<html><body><p><a href="http://google.com">Link</a></p></body></html>'
+
+        class Upper(Element):
+            def parse(self, html):
+                return super(Upper, self).parse(html).upper()
+
+        class A(Content):
+            el1 = Upper(xpath='/html/body/p/a/text()')
+
+        assert A().parse(html) == {'el1': 'LINK'}
+
+    def test_parse_with_overridden_element_and_content_filter(self):
+        class Title(Element):
+            def parse(self, html, encoding=None):
+                return super(Title, self).parse(html, encoding)
+
+        class A(Content):
+            title = Title(xpath='//h1/text()', filter='upper')
+
+            def upper(self, value):
+                return value.upper()
+
+        class B(Content):
+            a = A()
+
+        assert A._bound_plan is None
+        assert B._bound_plan is None
+        assert {'title': 'HI'} == A().parse(u'<h1>hi</h1>')
+        assert {'a': {'title': 'HI'}} == B().parse(u'<h1>hi</h1>')
+
+    def test_iter_parse(self, mocker):
+        html = u'<html><body><ul>{}</ul></body></html>'.format(
+            u''.join(u'<li>{}</li>'.format(i) for i in range(100))
+        )
+        fn = mocker.Mock(side_effect=lambda v: v)
+
+        class A(Content):
+            value = Element(xpath='./text()', filter=fn)
+
+        result = A(xpath='//li', many=True).iter_parse(html)
+
+        assert isinstance(result, types.GeneratorType)
+        assert [{'value': '0'}, {'value': '1'}] == list(itertools.islice(result, 2))
+        assert 2 == fn.call_count
+
+    def test_iter_parse_with_filter(self):
+        html = u'<html><body><ul><li>1</li><li>2</li><li>3</li></ul></body></html>'
+
+        class A(Content):
+            value = Element(xpath='./text()')
+
+        content = A(xpath='//li', many=True, filter=lambda values: values[::-1])
+        assert [{'value': '3'}, {'value': '2'}, {'value': '1'}] == list(content.iter_parse(html))
+
+        content = A(xpath='//li')
+        assert [{'value': '1'}] == list(content.iter_parse(html))
+
+        content = A(xpath='//p', many=True)
+        assert [] == list(content.iter_parse(html))
+
+    def test_iterparse(self):
+        html = u'<html><body><ul>{}</ul></body></html>'.format(u''.join(
+            u'<li><b>{0}</b><a href="/{0}">link &amp; {0}</a></li>'.format(i)
+            for i in range(2000)
+        ))
+
+        class A(Content):
+            value = Element(xpath='./b/text()', filter=int)
+            link = Element(xpath='./a')
+            siblings = Element(parser='count_siblings', filter=int)
+
+            def count_siblings(self, selector):
+                return len(selector[0].root.getparent())
+
+        result = list(A().iterparse(io.BytesIO(html.encode('utf-8')), tag='li'))
+
+        assert 2000 == len(result)
+        assert {'value': 10, 'link': 'link & 10'} == {
+            k: v for k, v in result[10].items() if k != 'siblings'
+        }
+        assert max(r['siblings'] for r in result) < 1000
+
+    def test_iterparse_nested(self):
+        html = (
+            b'<html><body><div><h2>outer</h2><div><h2>inner</h2><p>x</p></div><p>y</p></div>'
+            b'<div><h2>last</h2></div></body></html>'
+        )
+
+        class A(Content):
+            name = Element(xpath='./h2/text()')
+            text = Element(xpath='./p/text()')
+
+        result = list(A().iterparse(io.BytesIO(html), tag='div'))
+        assert [
+            {'name': 'inner', 'text': 'x'},
+            {'name': 'outer', 'text': 'y'},
+            {'name': 'last', 'text': None},
+        ] == result
+        expected = A(xpath='//div', many=True).parse(html)
+        assert {v['name']: v for v in expected} == {v['name']: v for v in result}
+
+    def test_iterparse_xml(self):
+        xml = b'<items><item><v>1</v></item><item><v>2</v></item></items>'
+
+        class A(Content):
+            value = Element(xpath='./v/text()')
+
+        result = list(A().iterparse(io.BytesIO(xml), tag='item', type='xml', object=OrderedDict))
+        assert [OrderedDict(value='1'), OrderedDict(value='2')] == result
+
+    def test_parse_concurrently(self):
+        class Item(Content):
+            name = Element(xpath='./span/text()', filter='upper')
+            tags = Element(xpath='./b/text()', parser='all', filter=Map('upper'))
+
+            def all(self, selector):
+                return selector.extract()
+
+        class Page(Content):
+            title = Element(xpath='//h1/text()')
+            items = Item(xpath='//li', many=True)
+
+            def upper(self, value):
+                return value.upper()
+
+        def make_html(i):
+            return u'<h1>page {}</h1><ul>{}</ul>'.format(i, u''.join(
+                u'<li><span>item{}-{}</span><b>a</b><b>b</b></li>'.format(i, j)
+                for j in range(20)
+            ))
+
+        pages = [make_html(i) for i in range(20)]
+        page = Page()
+        expected = [page.parse(html) for html in pages]
+
+        results = {}
+        errors = []
+
+        def run(n):
+            try:
+                for _ in range(5):
+                    results[n] = [page.parse(html) for html in pages]
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(n, )) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [] == errors
+        assert all(expected == result for result in results.values())
+        assert 8 == len(results)
+
+    def test_parse_with_only_and_exclude(self):
+        class Item(Content):
+            name = Element(xpath='./span/text()')
+            price = Element(xpath='./b/text()', filter=int)
+
+        class Page(Content):
+            title = Element(xpath='//h1/text()')
+            description = Element(xpath='//p/text()', filter='fail')
+            items = Item(xpath='//li', many=True)
+
+            def fail(self, value):
+                raise AssertionError('description is evaluated.')
+
+        html = u'<h1>title</h1><p>aaa</p><ul><li><span>a</span><b>1</b></li></ul>'
+        page = Page()
+
+        assert {'title': 'title', 'items': [{'price': 1}]} == \
+            page.parse(html, only=['title', 'items.price'])
+        assert {'items': [{'name': 'a', 'price': 1}]} == page.parse(html, only=['items'])
+        assert {'title': 'title', 'items': [{'name': 'a'}]} == \
+            page.parse(html, exclude=['description', 'items.price'])
+        assert {'items': [{'name': 'a'}]} == \
+            page.parse(html, only=['items'], exclude=['items.price'])
+
+        with pytest.raises(ValueError):
+            page.parse(html, only=['items.unknown'])
+        with pytest.raises(ValueError):
+            page.parse(html, only=['title.unknown'])
+
+    def test_parse_lazy(self):
+        calls = []
+
+        class Item(Content):
+            name = Element(xpath='./span/text()', filter='record')
+            price = Element(xpath='./b/text()', filter=int)
+
+            def record(self, value):
+                calls.append(value)
+                return value
+
+        class Page(Content):
+            title = Element(xpath='//h1/text()')
+            items = Item(xpath='//li', many=True)
+
+        html = u'<h1>title</h1><ul><li><span>a</span><b>1</b></li><li><span>b</span></li></ul>'
+        result = Page().parse(html, lazy=True)
+
+        assert [] == calls
+        assert 'title' == result['title']
+        assert ['title'] == result.evaluated
+
+        items = result['items']
+        assert 1 == items[0]['price']
+        assert [] == calls
+        assert 'a' == items[0]['name']
+        assert 'a' == items[0]['name']
+        assert ['a'] == calls
+
+        assert Page().parse(html) == result
+        assert ['title', 'items'] == sorted(result, reverse=True)
+        assert 2 == len(result)
+
+        with pytest.raises(ValueError):
+            Page().parse(html, lazy=True, errors='collect')
+
+    def test_parse_slots(self):
+        html = u'<h1>title</h1><ul><li><span>a</span><b>1</b></li><li><span>b</span></li></ul>'
+        result = SlottedPage().parse(html, record_type='slots')
+
+        assert isinstance(result, SlottedPage.record_class)
+        assert isinstance(result.items[0], SlottedItem.record_class)
+        assert not hasattr(result, '__dict__')
+        assert ['items', 'title'] == sorted(SlottedPage.record_class.__slots__)
+        assert 'title' == result.title == result['title']
+        assert 1 == result.items[0].price
+        assert SlottedPage().parse(html) == result
+        assert {
+            'title': 'title',
+            'items': [{'name': 'a', 'price': 1}, {'name': 'b', 'price': None}],
+        } == result._asdict()
+        assert 'title' == SlottedPage().parse(html, object=dict, record_type='slots')['title']
+        assert pickle.loads(pickle.dumps(result)) == result
+
+    def test_parse_slots_with_non_identifier_field(self):
+        content = Content.inline(xpath='//div', **{'data-x': Element(xpath='./@data-x')})
+        html = u'<div data-x="1"></div>'
+
+        assert {'data-x': '1'} == content.parse(html)
+        with pytest.raises(ValueError):
+            content.parse(html, record_type='slots')
+
+    def test_record_class_per_content(self):
+        class Base(Content):
+            a = Element(xpath='//a/text()')
+
+        class Sub(Base):
+            b = Element(xpath='//b/text()')
+
+        assert ['a', 'b'] == sorted(Sub.record_class.__slots__)
+        assert ('a', ) == Base.record_class.__slots__
+        assert Base.record_class is Base().record_class
+
+    def test_parse_slots_with_content_filter(self):
+        html = u'<h1>title</h1><ul><li><span>a</span><b>1</b></li></ul>'
+
+        class Page(Content):
+            title = Element(xpath='//h1/text()')
+            items = SlottedItem(xpath='//li', many=True, filter=Map(RenameKey({'name': 'n'})))
+            first = Content.inline(
+                xpath='//li', filter=RenameKey({'name': 'n'}),
+                name=Element(xpath='./span/text()'),
+                item=SlottedItem(),
+            )
+
+        result = Page().parse(html, record_type='slots')
+        assert isinstance(result, Page.record_class)
+        assert [{'n': 'a', 'price': 1}] == result.items
+        assert {'n': 'a', 'item': {'name': 'a', 'price': 1}} == result.first
+        assert type(result.first['item']) is dict
+        assert Page().parse(html) == result._asdict()
+
+    def test_parse_slots_with_only(self):
+        html = u'<h1>title</h1><ul><li><span>a</span><b>1</b></li></ul>'
+        result = SlottedPage().parse(html, record_type='slots', only=['items.name'])
+
+        assert 'items' in result
+        assert 'title' not in result
+        assert ['items'] == list(result)
+        with pytest.raises(KeyError):
+            result['title']
+        assert {'items': [{'name': 'a'}]} == result._asdict()
+
+    def test_parse_columns(self):
+        class Seller(Content):
+            name = Element(xpath='./i/text()')
+
+        class Item(SlottedItem):
+            seller = Seller()
+            sale = Element(xpath='./span/text()', filter=lambda v: v == 'a')
+            tags = Element(xpath='./u/text()', parser=All(), filter=through)
+
+        html = u"""
+            <ul>
+                <li class="sale"><span>a</span><b>1</b><i>x</i><u>t</u></li>
+                <li><span>b</span><b>2</b></li>
+            </ul>
+        """
+        result = Item(xpath='//li', many=True).parse(html, layout='columns')
+
+        assert ['name', 'price', 'sale', 'seller.name', 'tags'] == sorted(result)
+        assert ['a', 'b'] == result['name']
+        assert array(int_typecode, [1, 2]) == result['price']
+        assert array('b', [True, False]) == result['sale']
+        assert ['x', None] == result['seller.name']
+        assert [['t'], None] == result['tags']
+
+        result = Item(xpath='//li', many=True).parse(html, layout='columns', only=['price'])
+        assert {'price': array(int_typecode, [1, 2])} == result
+
+        result = Item(xpath='//table', many=True).parse(html, layout='columns', only=['price'])
+        assert {'price': []} == result
+
+    def test_parse_columns_with_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        html = u'<ul><li><span>a</span><b>1</b></li><li><span>b</span></li></ul>'
+        result = SlottedItem(xpath='//li', many=True).parse(html, layout='columns', numpy=True)
+
+        assert numpy.float64 == result['price'].dtype
+        assert 1.0 == result['price'][0]
+        assert numpy.isnan(result['price'][1])
+
+    def test_parse_columns_with_content_filter(self):
+        html = u'<ul><li><span>a</span><b>1</b></li></ul>'
+        with pytest.raises(ValueError):
+            SlottedItem(xpath='//li', many=True, filter=len).parse(html, layout='columns')
+        with pytest.raises(ValueError):
+            SlottedItem(xpath='//li', many=True).parse(html, layout='columns', lazy=True)
+
+    def test_parse_slots_with_collect(self):
+        html = u'<h1>title</h1><ul><li><span>a</span><b>x</b></li></ul>'
+        result, errors = SlottedPage().parse(html, record_type='slots', errors='collect')
+
+        assert isinstance(result.items[0], SlottedItem.record_class)
+        assert result.items[0].price is None
+        assert ['items.price'] == [e.field for e in errors]
+
 
 class TestElement(object):
     def test_get_parser(self):
@@ -213,3 +614,20 @@ class TestElement(object):
     def test_parse(self):
         html = u'<html><body><p><a href="http://google.com">Link</a></p></body></html>'
         assert Element(xpath='/html/body/p/a/text()').parse(html) == 'Link'
+
+    def test_parse_first_match(self):
+        html = u'<html><body><p><a href="/a">a</a><a href="/b">b</a></p></body></html>'
+        element = Element(xpath='//a/@href')
+        assert element.get_plan().xpath.first
+        assert '/a' == element.parse(html)
+
+        element = Element(xpath='//a/@href', parser=All(), filter=through)
+        assert not element.get_plan().xpath.first
+        assert ['/a', '/b'] == element.parse(html)
+
+    def test_parse_text_keeps_escaped_markup(self):
+        html = u'<html><body><p>if  a &lt;b&gt; c then</p></body></html>'
+        assert 'if a <b> c then' == Element(xpath='//p').parse(html)
+        assert 'if a <b> c then' == Element(xpath='//p', parser=Text()).parse(html)
+        element = Element(xpath='//p', parser=Text(), filter=through)
+        assert 'if  a <b> c then' == element.parse(html)
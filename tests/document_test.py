@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from parsel import Selector
+
+from scrapbook import Content, Document, Element, parse_all, through
+from scrapbook.parsers import All
+from scrapbook.xpath import XPath
+
+
+html = u'''
+<html>
+    <body>
+        <h1>Title</h1>
+        <ul>
+            <li><a href="/a">aaa</a></li>
+            <li><a href="/b">bbb</a></li>
+        </ul>
+    </body>
+</html>
+'''
+
+
+class Link(Content):
+    text = Element(xpath='./a/text()')
+    url = Element(xpath='./a/@href')
+
+
+class Page(Content):
+    title = Element(xpath='//h1/text()')
+    links = Link(xpath='//li', many=True)
+
+
+class Titles(Content):
+    title = Element(xpath='//h1/text()')
+    texts = Element(xpath='//li/a/text()', parser=All(), filter=through)
+
+
+class TestDocument(object):
+    def test_parse(self):
+        document = Document(html)
+        assert Page().parse(html) == Page().parse(document)
+        assert 'Title' == Element(xpath='//h1/text()').parse(document)
+
+    def test_from_selector(self):
+        document = Document(Selector(html))
+        assert ['/a', '/b'] == document.xpath('//li/a/@href').extract()
+
+    def test_memoize(self):
+        document = Document(html)
+        first = document.xpath('//li')
+        assert 1 == len(document)
+
+        second = document.xpath('//li')
+        assert 1 == len(document)
+        assert [s.root for s in first] == [s.root for s in second]
+
+        document.xpath('./a/text()')
+        assert 2 == len(document)
+
+        assert ['/a'] == XPath('//li/a/@href', first=True)(document.selector).extract()
+        assert ['/a', '/b'] == document.xpath('//li/a/@href').extract()
+        assert 4 == len(document)
+
+        document.clear()
+        assert 0 == len(document)
+
+    def test_iter_parse(self):
+        document = Document(html)
+        expected = [{'text': 'aaa', 'url': '/a'}, {'text': 'bbb', 'url': '/b'}]
+        assert expected == list(Link(xpath='//li', many=True).iter_parse(document))
+        assert expected == list(Link(xpath='//li', many=True).iter_parse(document))
+
+
+class TestParseAll(object):
+    def test_(self):
+        result = parse_all(html, [Page, Titles()])
+        assert [Page().parse(html), Titles().parse(html)] == result
+
+    def test_shares_results(self):
+        document = Document(html)
+        parse_all(document, [Page])
+        size = len(document)
+
+        parse_all(document, [Titles])
+        assert size + 1 == len(document)
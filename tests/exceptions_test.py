@@ -2,11 +2,15 @@
 from __future__ import absolute_import, print_function
 
 from parsel import Selector
+import pytest
 
 from scrapbook import Content, Element, filters
 from scrapbook.exceptions import ScrapBookError
 
 
+pytestmark = pytest.mark.usefixtures('engine')
+
+
 class TestScrapBookError(object):
     def test_get_parent_property(self):
         ex1 = Exception('Root exception')
@@ -98,3 +102,91 @@ class TestScrapBookError(object):
             assert e.value == 'aaaa'
         else:
             assert False, 'ScrapBookError is not raise.'
+
+    def test_message_is_lazy(self, mocker):
+        value = mocker.MagicMock()
+        error = ScrapBookError(ScrapBookError(ValueError('aaa'), value=value), field='bbb')
+        assert not value.__str__.called
+
+        message = str(error)
+        assert 1 == value.__str__.call_count
+        assert 'Raises ValueError: aaa' in message
+        assert 'Field: bbb' in message
+        assert message == str(error)
+        assert 1 == value.__str__.call_count
+
+
+class Item(Content):
+    number = Element(xpath='./span/text()', filter=int)
+    name = Element(xpath='./b/text()')
+
+
+class Page(Content):
+    title = Element(xpath='//h1/text()', filter=int)
+    items = Item(xpath='//li', many=True)
+
+
+html = u'''
+<html>
+    <body>
+        <h1>Title</h1>
+        <ul>
+            <li><span>1</span><b>a</b></li>
+            <li><span>x</span><b>b</b></li>
+            <li><span>3</span><b>c</b></li>
+        </ul>
+    </body>
+</html>
+'''
+
+
+class TestCollectErrors(object):
+    def test_(self):
+        value, errors = Page().parse(html, errors='collect')
+
+        assert {
+            'title': None,
+            'items': [
+                {'number': 1, 'name': 'a'},
+                {'number': None, 'name': 'b'},
+                {'number': 3, 'name': 'c'},
+            ],
+        } == value
+        assert [
+            ('items.number', './span/text()', ValueError),
+            ('title', '//h1/text()', ValueError),
+        ] == sorted(e[:3] for e in errors)
+        assert all(isinstance(e.error, ScrapBookError) for e in errors)
+
+    def test_without_errors(self):
+        value, errors = Item(xpath='//li[1]').parse(html, errors='collect')
+        assert {'number': 1, 'name': 'a'} == value
+        assert [] == errors
+
+    def test_with_content_filter(self):
+        def fail(value):
+            raise KeyError('aaa')
+
+        class Failing(Content):
+            items = Item(xpath='//li', many=True, filter=fail)
+            title = Element(xpath='//h1/text()')
+
+        value, errors = Failing().parse(html, errors='collect')
+        assert {'items': None, 'title': 'Title'} == value
+        assert [('items.number', ValueError), ('items', KeyError)] == \
+            [(e.field, e.type) for e in errors]
+
+    def test_not_found(self):
+        assert (None, []) == Page(xpath='//table').parse(html, errors='collect')
+
+    def test_raise(self):
+        try:
+            Page().parse(html)
+        except ScrapBookError as e:
+            assert e.field in ('title', 'items.number')
+        else:
+            assert False, 'ScrapBookError is not raise.'
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Page().parse(html, errors='ignore')
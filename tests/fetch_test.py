@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import socket
+from socketserver import ThreadingMixIn
+import threading
+import time
+
+import pytest
+
+from scrapbook import Content, Element
+from scrapbook.fetch import build_request, Fetcher, HTTPError, Response
+
+
+class Item(Content):
+    title = Element(xpath='//h1/text()')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            self.route()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def route(self):
+        path = self.path
+        if path.startswith('/item/'):
+            time.sleep(0.01)
+            self.send(200, u'<h1>item {}</h1>'.format(path[6:]).encode('utf-8'))
+        elif path.startswith('/echo/'):
+            self.send(200, u'<h1>{}</h1>'.format(path).encode('utf-8'))
+        elif path == '/flaky':
+            if self.server.requests.count(path) < 3:
+                self.send(503, b'', [('Retry-After', '0')])
+            else:
+                self.send(200, b'<h1>flaky</h1>')
+        elif path == '/redirect':
+            self.send(302, b'', [('Location', '/item/redirected')])
+        elif path == '/gzip':
+            self.send(200, gzip.compress(b'<h1>gzip</h1>'), [('Content-Encoding', 'gzip')])
+        elif path == '/euc-jp':
+            self.send(200, u'<h1>日本語</h1>'.encode('euc-jp'),
+                      [('Content-Type', 'text/html; charset=EUC-JP')])
+        elif path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'<h1>chun', b'ked</h1>'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        elif path == '/close':
+            self.send_response(200)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b'<h1>close</h1>')
+            self.close_connection = True
+        else:
+            self.send(404, b'not found')
+
+    def send(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    server = Server(('127.0.0.1', 0), Handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = set()
+    server.active = 0
+    server.max_active = 0
+    server.url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, args=(0.05, ))
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def silent_server():
+    # Accepts connections and never responds.
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(8)
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                connections.append(sock.accept()[0])
+            except OSError:
+                return
+
+    thread = threading.Thread(target=accept)
+    thread.daemon = True
+    thread.start()
+    yield sock.getsockname()[1]
+    sock.close()
+    for connection in connections:
+        connection.close()
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.mark.usefixtures('loop')
+class TestFetcher(object):
+    def test_run(self, server):
+        urls = ['{}/item/{}'.format(server.url, i) for i in range(20)]
+        fetcher = Fetcher(Item(), concurrency=8, per_host=3, backoff=0)
+        results = fetcher.run(urls)
+
+        assert list(range(20)) == [r.index for r in results]
+        assert [{'title': 'item {}'.format(i)} for i in range(20)] == [r.value for r in results]
+        assert all(r.error is None for r in results)
+        assert server.max_active <= 3
+        assert len(server.connections) <= 3
+        assert 20 == fetcher.stats.pages
+        assert fetcher.stats.pages_per_sec > 0
+        assert 0 == fetcher.stats.pages_queue
+
+    def test_responses(self, server):
+        paths = ['/redirect', '/gzip', '/euc-jp', '/chunked', '/close', '/flaky']
+        fetcher = Fetcher(Item(), backoff=0)
+        results = fetcher.run(server.url + p for p in paths)
+
+        assert [
+            'item redirected', 'gzip', u'日本語', 'chunked', 'close', 'flaky',
+        ] == [r.value['title'] for r in results]
+        assert 2 == fetcher.stats.retries
+
+    def test_errors(self, server):
+        fetcher = Fetcher(Item(), retries=1, backoff=0)
+        results = fetcher.run([server.url + '/missing', server.url + '/flaky',
+                               'http://127.0.0.1:1/'])
+
+        assert isinstance(results[0].error, HTTPError)
+        assert 404 == results[0].error.response.status
+        assert isinstance(results[1].error, HTTPError)
+        assert 503 == results[1].error.response.status
+        assert isinstance(results[2].error, OSError)
+        assert 3 == fetcher.stats.errors
+
+    def test_timeout(self, silent_server):
+        fetcher = Fetcher(Item(), retries=1, backoff=0, timeout=0.2)
+        start = time.time()
+        results = fetcher.run([
+            'http://127.0.0.1:{}/'.format(silent_server),
+            # The TLS handshake never completes while connecting.
+            'https://127.0.0.1:{}/'.format(silent_server),
+        ])
+
+        assert all(isinstance(r.error, asyncio.TimeoutError) for r in results)
+        assert 2 == fetcher.stats.retries
+        assert time.time() - start < 5
+
+    def test_url_quoting(self, server):
+        fetcher = Fetcher(Item())
+        results = fetcher.run([
+            server.url + '/echo/a b?q=1 2',
+            server.url + u'/echo/café?q=日本',
+            server.url + '/echo/a%20b?q=%2F',
+        ])
+
+        assert [
+            '/echo/a%20b?q=1%202',
+            '/echo/caf%C3%A9?q=%E6%97%A5%E6%9C%AC',
+            '/echo/a%20b?q=%2F',
+        ] == [r.value['title'] for r in results]
+
+    def test_invalid_url(self, server):
+        fetcher = Fetcher(Item(), backoff=0)
+        results = fetcher.run([
+            'example.invalid/page', 'ftp://example.invalid/page', 'http:///page',
+            server.url + '/item/1',
+        ])
+
+        assert all(isinstance(r.error, ValueError) for r in results[:3])
+        assert {'title': 'item 1'} == results[3].value
+        assert ['/item/1'] == server.requests
+        assert 0 == fetcher.stats.retries
+
+    def test_without_content(self, server):
+        results = Fetcher().run([server.url + '/item/1'])
+        assert isinstance(results[0].value, Response)
+        assert b'<h1>item 1</h1>' == results[0].value.body
+
+    def test_backpressure(self, server, loop):
+        urls = ('{}/item/{}'.format(server.url, i) for i in range(30))
+        fetcher = Fetcher(Item(), concurrency=4, per_host=4, queue_size=2, parsers=1,
+                          executor=ThreadPoolExecutor(1))
+
+        async def consume():
+            values = []
+            async for result in fetcher.results(urls):
+                await asyncio.sleep(0.01)
+                values.append(result.value)
+            return values
+
+        assert 30 == len(loop.run_until_complete(consume()))
+        assert fetcher.stats.max_pages_queue <= 2
+        assert fetcher.stats.max_results_queue <= 2
+        assert 30 == len(server.requests)
+
+
+class TestBuildRequest(object):
+    def test_(self):
+        key, data = build_request(u'https://bücher.example:8443/a b', {'Accept': '*/*'})
+        assert ('https', 'xn--bcher-kva.example', 8443) == key
+        assert (
+            b'GET /a%20b HTTP/1.1\r\nHost: xn--bcher-kva.example:8443\r\nAccept: */*\r\n\r\n'
+        ) == data
+
+    @pytest.mark.parametrize('url', [
+        'example.invalid/page', 'ftp://example.invalid/page', 'http:///page',
+    ])
+    def test_invalid(self, url):
+        with pytest.raises(ValueError):
+            build_request(url, {})
@@ -130,6 +130,12 @@ class TestCleanText(object):
         ('aa       bb', 'aa bb'),
         ('<p>  aaa  &amp;  bbb  </p>', 'aaa & bbb'),
         ('a\nb', 'a\nb'),
+        ('a b', 'a b'),
+        (u'a\u3000b', 'a b'),
+        (u'a \u3000  \u3000b', 'a b'),
+        ('&lt;p&gt;', '<p>'),
+        ('a \t b', 'a \t b'),
+        ('   ', None),
         ('', None),
         (None, None),
     ])
@@ -139,11 +145,19 @@ class TestCleanText(object):
     def test_with_empty_value(self):
         assert 'empty' == CleanText(empty_value='empty')('')
 
+    @pytest.mark.parametrize(['text', 'result'], [
+        ('  a <b>  &amp;  ', 'a <b> &amp;'),
+        (u'a\u3000b', 'a b'),
+    ])
+    def test_with_markup_false(self, text, result):
+        assert result == CleanText(markup=False)(text)
+
     @pytest.mark.parametrize(['text', 'result'], [
         ('a\nb', 'a b'),
         ('a\rb', 'a b'),
         ('a\n\rb', 'a b'),
         ('a\r\nb', 'a b'),
+        ('a \n \n b', 'a b'),
     ])
     def test_with_remove_line_breaks(self, text, result):
         assert result == CleanText(remove_line_breaks=True)(text)
@@ -315,6 +329,31 @@ class TestDateTime(object):
         dt = DateTime(truncate_timezone=True)('2001-02-03T04:05:06+09:00')
         assert dt.tzinfo is None
 
+    def test_cache(self):
+        filter = DateTime(truncate_time=True)
+
+        assert date(2001, 2, 3) == filter('2001-02-03 04:05:06')
+        assert date(2001, 2, 3) == filter('2001-02-03 04:05:06')
+        assert date(2001, 2, 4) == filter('2001-02-04 04:05:06')
+
+        info = filter.cache_info()
+        assert (1, 2) == (info['values'].hits, info['values'].misses)
+        assert (1, 1) == (info['formats'].hits, info['formats'].misses)
+
+    @pytest.mark.parametrize(['values', 'result'], [
+        (['01/02/2001', '13/02/2001'], datetime(2001, 2, 13)),
+        (['13/02/2001', '01/02/2001'], datetime(2001, 1, 2)),
+        (['2001', '0081'], datetime(1981, 1, 1)),
+        (['2001-02-03T04:05:06+09:00', '2001-02-03T04:05:06+00:00'],
+         datetime(2001, 2, 3, 4, 5, 6, 0, tzoffset(None, 0))),
+    ])
+    def test_inferred_format(self, values, result):
+        filter = DateTime()
+        for value in values:
+            dt = filter(value)
+        assert result == dt
+        assert isinstance(dt.tzinfo, type(result.tzinfo))
+
 
 class TestBool(object):
     @pytest.mark.parametrize(['value', 'result'], [
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import os
+import subprocess
+import sys
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds for import scrapbook, not counting parsel, lxml and six.
+budget = float(os.environ.get('SCRAPBOOK_IMPORT_BUDGET_MS', 75))
+
+# Imported on first use only.
+lazy_modules = ('dateutil', 'html.parser', 'HTMLParser', 'multiprocessing', 'numpy', 'pickle')
+
+dependencies = 'import parsel, lxml.html, six'
+
+
+def run(code, *options):
+    return subprocess.check_output(
+        [sys.executable] + list(options) + ['-c', code],
+        cwd=root, stderr=subprocess.STDOUT, universal_newlines=True,
+    )
+
+
+def import_time():
+    if sys.version_info >= (3, 7):
+        output = run(dependencies + '; import scrapbook', '-X', 'importtime')
+        for line in output.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line[len('import time:'):].split('|')
+            if line.startswith('import time:') and fields[2].strip() == 'scrapbook':
+                return int(fields[1]) / 1000.0
+        raise AssertionError(output)
+
+    # -X importtime is not available, time the import itself.
+    output = run(
+        dependencies + ', timeit; start = timeit.default_timer(); import scrapbook; '
+        'print((timeit.default_timer() - start) * 1000)'
+    )
+    return float(output)
+
+
+class TestImport(object):
+    def test_lazy_modules(self):
+        output = run('import sys, scrapbook; print(" ".join(m for m in {!r} if m in sys.modules))'
+                     .format(lazy_modules))
+        assert output.split() == []
+
+    def test_import_time(self):
+        elapsed = min(import_time() for _ in range(3))
+        assert elapsed < budget, 'import scrapbook took {:.1f} ms, the budget is {:.1f} ms'.format(
+            elapsed, budget,
+        )
@@ -13,7 +13,9 @@ from scrapbook.parsers import (
     ParseDefinitionList,
     ParseList,
     ParseTable,
+    Text,
 )
+from scrapbook.filters import clean_text
 
 
 basepath = os.path.dirname(os.path.abspath(__file__))
@@ -38,6 +40,29 @@ class TestAll(object):
         assert ['aaa', 'bbb', 'ccc'] == All()(selector.xpath('//html/body/p/text()'))
 
 
+class TestText(object):
+    def test_(self):
+        selector = Selector(
+            u'<html><body><p>aaa <b>bbb</b> &amp; <!-- x -->ccc</p>ddd</body></html>',
+        )
+        assert 'aaa bbb & ccc' == Text()(selector.xpath('//p'))
+
+    def test_with_all(self):
+        selector = Selector(u'<html><body><p>aaa <b>bbb</b></p><p>ccc</p></body></html>')
+        assert ['aaa bbb', 'ccc'] == Text(all=True)(selector.xpath('//p'))
+
+    def test_with_text_and_attribute(self):
+        selector = Selector(u'<html><body><a href="/aaa">bbb</a></body></html>')
+        assert '/aaa' == Text()(selector.xpath('//a/@href'))
+        assert 'bbb' == Text()(selector.xpath('//a/text()'))
+        assert '1.0' == Text()(selector.xpath('count(//a)'))
+
+    def test_same_as_first(self):
+        selector = Selector(load_html('parse_table/table.html'))
+        selector = selector.xpath('//table')
+        assert clean_text(First()(selector)) == clean_text(Text()(selector))
+
+
 class TestParseTable(object):
     @pytest.mark.parametrize('filepath', [
         'parse_table/table.html',
@@ -98,6 +123,74 @@ class TestParseTable(object):
         ]
         assert expected == result
 
+    def test_with_span(self):
+        selector = Selector(u'''
+            <table>
+                <tr><th>a</th><th colspan="2">b</th></tr>
+                <tr><td rowspan="2">1</td><td>2</td><td rowspan="3">3</td></tr>
+                <tr><td>4</td></tr>
+                <tr><td>5</td><td>6</td></tr>
+            </table>
+        ''')
+        result = ParseTable()(selector.xpath('//table'))
+        expected = [
+            ['a', 'b', 'b'],
+            ['1', '2', '3'],
+            ['1', '4', '3'],
+            ['5', '6', '3'],
+        ]
+        assert expected == result
+
+    def test_with_span_in_header(self):
+        selector = Selector(u'''
+            <table>
+                <tr><th>a</th><th colspan="2">b</th><th></th><th></th></tr>
+                <tr><td>1</td><td>2</td><td>3</td><td>4</td><td>5</td></tr>
+            </table>
+        ''')
+        table = selector.xpath('//table')
+
+        expected = {'a': '1', 'b': '2', 'b_2': '3', None: '4', '_2': '5'}
+        assert [expected] == ParseTable(has_header=True)(table)
+        assert {k: [v] for k, v in expected.items()} == ParseTable(
+            has_header=True, layout='columns',
+        )(table)
+
+    def test_with_columns(self):
+        selector = Selector(load_html('parse_table/table.html'))
+        result = ParseTable(has_header=True, layout='columns')(selector.xpath('//table'))
+
+        assert ['Company', 'Contact', 'Country'] == sorted(result)
+        assert 'Alfreds Futterkiste' == result['Company'][0]
+        assert ['Germany', 'Mexico', 'Austria', 'UK', 'Canada', None] == result['Country']
+
+    def test_with_columns_has_no_header(self):
+        selector = Selector(u'<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>')
+        result = ParseTable(layout='columns')(selector.xpath('//table'))
+        assert {0: ['a', 'c'], 1: ['b', None]} == result
+
+    def test_with_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        selector = Selector(u'''
+            <table>
+                <tr><th>name</th><th>count</th><th>price</th></tr>
+                <tr><td>a</td><td>1</td><td>1.5</td></tr>
+                <tr><td>b</td><td>2</td><td></td></tr>
+            </table>
+        ''')
+        result = ParseTable(has_header=True, layout='columns', numpy=True)(
+            selector.xpath('//table'))
+
+        assert ['a', 'b'] == result['name']
+        assert numpy.int64 == result['count'].dtype
+        assert [1, 2] == result['count'].tolist()
+        assert 1.5 == result['price'][0]
+        assert numpy.isnan(result['price'][1])
+
+    def test_invalid_layout(self):
+        with pytest.raises(ValueError):
+            ParseTable(layout='cells')
+
 
 class TestParseList(object):
     @pytest.mark.parametrize('filepath', [
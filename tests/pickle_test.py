@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import pickle
+
+from scrapbook import Content, Element
+from scrapbook.filters import CleanText, DateTime, Map
+from scrapbook.parsers import All
+from scrapbook.xpath import XPath
+
+
+html = u'''
+<html>
+    <body>
+        <h1> Title </h1>
+        <div class="item"><a href="/a">a</a><time>2017-01-01</time></div>
+        <div class="item"><a href="/b">b</a><time>2017-01-02</time></div>
+    </body>
+</html>
+'''
+
+
+class Item(Content):
+    url = Element(xpath='./a/@href')
+    date = Element(xpath='./time/text()', filter=DateTime(truncate_time=True))
+
+
+class Page(Content):
+    title = Element(xpath='//h1/text()', filter='upper')
+    items = Item(xpath='//div[@class="item"]', many=True)
+    links = Content.inline(
+        xpath='//body',
+        texts=Element(xpath='.//a/text()', parser=All(), filter=Map(CleanText())),
+    )
+
+    def upper(self, value):
+        return value.strip().upper()
+
+
+class TestPickle(object):
+    def test_xpath(self):
+        xpath = pickle.loads(pickle.dumps(XPath('//a', {'x': 'urn:x'})))
+        assert '//a' == xpath.expr
+        assert {'x': 'urn:x'} == xpath.namespaces
+
+    def test_inline_class_is_cached(self):
+        a = Content.inline(xpath='//a', text=Element(xpath='./text()'))
+        b = Content.inline(xpath='//b', text=Element(xpath='./text()'))
+        c = Content.inline(text=Element(xpath='./@href'))
+        assert type(a) is type(b)
+        assert type(a) is not type(c)
+        assert '//b' == b.xpath
+
+    def test_inline(self):
+        content = Content.inline(xpath='//a', text=Element(xpath='./text()'))
+        loaded = pickle.loads(pickle.dumps(content))
+        assert type(loaded) is type(content)
+        assert {'text': 'a'} == loaded.parse(html)
+
+    def test_content(self):
+        page = Page()
+        assert pickle.loads(pickle.dumps(page)).parse(html) == page.parse(html)
+
+    def test_method(self):
+        assert 'A' == pickle.loads(pickle.dumps(Page().upper, 2))(' a ')
+
+    def test_parse_many(self):
+        results = list(Page().parse_many([html] * 3, workers=2, executor='process'))
+        assert [Page().parse(html)] * 3 == [r.value for r in results]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import threading
+
+import pytest
+import six
+
+from scrapbook import Content, Element, profile, Stats
+from scrapbook.exceptions import ScrapBookError
+from scrapbook.filters import CleanText, through
+from scrapbook.parsers import All
+from scrapbook import profiling
+
+
+html = u'''
+<html>
+    <body>
+        <h1>Title</h1>
+        <div class="item"><span>1</span><a href="/a">a</a></div>
+        <div class="item"><span>2</span><a href="/b">b</a></div>
+        <div class="item"><span>x</span></div>
+    </body>
+</html>
+'''
+
+
+class Item(Content):
+    number = Element(xpath='./span/text()', filter=[CleanText(), int])
+    url = Element(xpath='./a/@href')
+
+
+class Overridden(Element):
+    def parse(self, html):
+        return 'overridden'
+
+
+class Page(Content):
+    title = Element(xpath='//h1/text()')
+    items = Item(xpath='//div[@class="item"][position() < 3]', many=True)
+    texts = Element(xpath='//span/text()', parser=All(), filter=through)
+    overridden = Overridden()
+
+
+class TestProfile(object):
+    def test_(self):
+        page = Page()
+        with profile() as stats:
+            result = page.parse(html)
+
+        assert result == page.parse(html)
+        assert ['', 'items', 'items.number', 'items.url', 'overridden', 'texts', 'title'] == \
+            sorted(stats.fields)
+
+        number = stats['items.number']
+        assert 2 == number.calls
+        assert 2 == number.nodes
+        assert ['CleanText', 'int'] == number.filters
+        assert all(t > 0 for t in number.filter_times)
+        assert number.time >= number.xpath_time + number.parser_time
+        assert 1 == stats['overridden'].calls
+        assert 3 == stats['texts'].size
+        assert 3 == stats['texts'].max_size
+
+    def test_disabled(self):
+        Page().parse(html)
+        assert profiling.current() is None
+        page = Page()
+        assert page.get_plan() is page._compiled
+
+    def test_error(self):
+        class Broken(Content):
+            items = Item(xpath='//div[@class="item"]', many=True)
+
+        with profile() as stats:
+            with pytest.raises(ScrapBookError):
+                Broken().parse(html)
+
+        assert 1 == stats['items.number'].errors
+        assert 1 == stats['items'].errors
+
+    def test_element(self):
+        with profile() as stats:
+            Element(xpath='//h1/text()').parse(html)
+        assert 1 == stats[''].calls
+
+    def test_accumulate(self):
+        stats = Stats()
+        with profile(stats):
+            Page().parse(html)
+        with profile(stats):
+            Page().parse(html)
+        assert 2 == stats['title'].calls
+
+    def test_thread_local(self):
+        results = []
+
+        def parse():
+            results.append(profiling.current())
+            Page().parse(html)
+
+        with profile() as stats:
+            thread = threading.Thread(target=parse)
+            thread.start()
+            thread.join()
+
+        assert [None] == results
+        assert 0 == len(stats.fields)
+
+
+class TestStats(object):
+    def test_merge(self):
+        a, b = Stats(), Stats()
+        with profile(a):
+            Page().parse(html)
+        with profile(b):
+            Page().parse(html)
+
+        a.merge(b)
+        assert 4 == a['items.number'].calls
+        assert 4 == a['items.number'].nodes
+
+    def test_as_dict(self):
+        with profile() as stats:
+            Page().parse(html)
+
+        data = stats.as_dict()['items.number']
+        assert 2 == data['calls']
+        assert ['CleanText', 'int'] == [f['name'] for f in data['filters']]
+
+    def test_dump(self):
+        with profile() as stats:
+            Page().parse(html)
+
+        fp = six.StringIO()
+        stats.dump(fp, limit=2)
+        lines = fp.getvalue().splitlines()
+        assert 3 == len(lines)
+        assert '<root>' == lines[1].split()[0]
+
+    def test_clear(self):
+        with profile() as stats:
+            Page().parse(html)
+        stats.clear()
+        assert 0 == len(stats.fields)
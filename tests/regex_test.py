@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import re
+
+from parsel import Selector
+import pytest
+
+import scrapbook
+from scrapbook import Content, Element
+from scrapbook.filters import Map, through
+from scrapbook.parsers import All, Text
+from scrapbook.regex import literal_prefix, NodeScan, Regex, Scan
+
+
+pytestmark = pytest.mark.usefixtures('engine')
+
+html = u'''
+<html>
+    <head>
+        <title>Item</title>
+        <script>var item = {"price": 1200, "sku": "ab-1", "tags": ["x", "y"]};</script>
+    </head>
+    <body>
+        <h1>Item</h1>
+        <script>var stock = {"count": 3};</script>
+    </body>
+</html>
+'''
+
+
+class Item(Content):
+    price = Element(regex=r'"price":\s*(\d+)', filter=int)
+    sku = Element(regex=r'"sku":\s*"([^"]*)"', filter='upper')
+    count = Element(regex=r'"count":\s*(\d+)', filter=int)
+    tags = Element(regex=r'"tags":\s*\[([^\]]*)\]', filter=lambda v: re.findall(r'"(\w+)"', v))
+    missing = Element(regex=r'"missing":\s*(\d+)')
+
+    def upper(self, value):
+        return value.upper()
+
+
+class Page(Content):
+    title = Element(xpath='//h1/text()')
+    item = Item()
+    keys = Element(xpath='//script/text()', regex=r'"(\w+)":', parser=All(), filter=through)
+
+
+class Mixed(Content):
+    title = Element(xpath='//h1/text()')
+    price = Element(regex=r'"price":\s*(\d+)', filter=int)
+    sku = Element(regex=r'"sku":\s*"([^"]*)"')
+    count = Element(regex=r'"count":\s*(\d+)', filter=int)
+
+
+@pytest.fixture
+def no_tree(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('The tree is built.')
+    monkeypatch.setattr(scrapbook, 'Selector', fail)
+    monkeypatch.setattr(scrapbook, 'load_selector', fail)
+
+
+class TestRegex(object):
+    @pytest.mark.parametrize('pattern, expected', [
+        (r'"price":\s*\d+', '"price": 1200'),
+        (r'"price":\s*(\d+)', '1200'),
+        (r'"(price)":\s*(\d+)', ('price', '1200')),
+        (r'"price":\s*(?P<price>\d+)', {'price': '1200'}),
+        (r'"unknown"', None),
+    ])
+    def test_(self, pattern, expected):
+        assert expected == Regex(pattern)(html)
+
+    def test_all(self):
+        assert ['price', 'sku', 'tags', 'count'] == Regex(r'"(\w+)":', all=True)(html)
+        assert Regex(r'"unknown"', all=True)(html) is None
+
+
+class TestLiteralPrefix(object):
+    @pytest.mark.parametrize('pattern, expected', [
+        (r'"price":\s*(\d+)', '"price":'),
+        (r'<title>(.*?)</title>', '<title>'),
+        (r'abc+', 'ab'),
+        (r'abc|abd', ''),
+        (r'(a)b\1', ''),
+        (r'(?x)ab c', ''),
+        (r'\d+', ''),
+    ])
+    def test_(self, pattern, expected):
+        assert expected == literal_prefix(re.compile(pattern))
+
+
+class TestScan(object):
+    def test_combine(self):
+        regexes = [
+            Regex(r'"price":\s*(\d+)'),
+            Regex(r'"sku":\s*"([^"]*)"'),
+            Regex(r'"(\w+)":\s*\['),
+            Regex(r'"(\w+)":', all=True),
+            Regex(r'<title>([^<]*)</title>'),
+        ]
+        scan = Scan(regexes)
+        assert 1 == len(scan.scans)
+        assert regexes[:3] == list(scan.scans[0][1])
+
+        matches = scan(html).matches
+        assert {'1200', 'ab-1', 'tags'} == set(matches.values())
+        for regex in regexes[:3]:
+            assert regex(html) == matches[regex]
+
+    def test_overlapping(self):
+        # A match of one regex may start within the match of another.
+        regexes = [Regex(r'aab'), Regex(r'ab(c)'), Regex(r'a\w{3}')]
+        text = u'xaabcaabd'
+        matches = Scan(regexes).scan(text)
+        assert ['aab', 'c', 'aabc'] == [matches[r] for r in regexes]
+
+    def test_misses(self):
+        # Once only the regexes already found match, the rest are searched one by one.
+        regexes = [Regex(r'"a":(\d)'), Regex(r'"b":(\d)'), Regex(r'"c":(\d)')]
+        text = u'"a":1' * 100 + u'"c":3'
+        assert ['1', None, '3'] == [Scan(regexes).scan(text)[r] for r in regexes]
+
+    def test_same_group_names(self):
+        class Numbers(Content):
+            price = Element(regex=r'"price":\s*(?P<v>\d+)', filter=through)
+            count = Element(regex=r'"count":\s*(?P<v>\d+)', filter=through)
+
+        assert [] == Numbers().get_plan().xpath.scans
+        assert {'price': {'v': '1200'}, 'count': {'v': '3'}} == Numbers().parse(html)
+
+
+class TestElement(object):
+    def test_parse(self, no_tree):
+        assert 'Item' == Element(regex=r'<h1>(.*)</h1>').parse(html)
+        assert 1200 == Element(regex=r'"price":\s*(\d+)', filter=int).parse(html.encode('utf-8'))
+        assert Element(regex=r'"unknown"').parse(html) is None
+        assert [{'key': 'price'}] == Element(
+            regex=r'"(?P<key>p\w+)"', parser=All(), filter=through,
+        ).parse(html)
+
+    def test_xpath(self):
+        element = Element(xpath='//body/script/text()', regex=r'"(\w+)":', parser=All(),
+                          filter=Map(lambda v: v.upper()))
+        assert ['COUNT'] == element.parse(html)
+        assert Element(xpath='//p/text()', regex='.+').parse(html) is None
+
+    def test_parser(self):
+        with pytest.raises(ValueError):
+            Element(regex=r'\d+', parser=Text()).get_plan()
+
+    def test_error(self):
+        element = Element(regex=r'"sku":\s*"([^"]*)"', filter=int)
+        with pytest.raises(scrapbook.ScrapBookError) as e:
+            element.parse(html)
+        assert 'ab-1' == e.value.value
+
+
+class TestContent(object):
+    expected = {
+        'price': 1200, 'sku': 'AB-1', 'count': 3, 'tags': ['x', 'y'], 'missing': None,
+    }
+
+    def test_parse(self, no_tree):
+        assert isinstance(Item().get_plan().xpath, Scan)
+        assert self.expected == Item().parse(html)
+        assert self.expected == Item().parse(html.encode('utf-8'))
+        assert self.expected == Item().parse(html, record_type='slots')._asdict()
+        assert {'price': 1200} == Item().parse(html, only=['price'])
+        assert [self.expected] == list(Item().iter_parse(html))
+
+    def test_nested(self, no_tree):
+        class Stock(Content):
+            item = Item()
+            inline = Content.inline(title=Element(regex=r'<title>(.*)</title>'))
+
+        assert {'item': self.expected, 'inline': {'title': 'Item'}} == Stock().parse(html)
+
+    def test_tree(self):
+        assert {
+            'title': 'Item',
+            'item': self.expected,
+            'keys': ['price', 'sku', 'tags', 'count'],
+        } == Page().parse(html)
+
+        item = Item(xpath='//body/script')
+        assert isinstance(item.get_plan().xpath, Scan)
+        assert {
+            'price': None, 'sku': None, 'count': 3, 'tags': None, 'missing': None,
+        } == item.parse(html)
+        assert item.parse(u'<p></p>') is None
+
+        items = Item(xpath='//script', many=True)
+        assert [1200, None] == [v['price'] for v in items.parse(html)]
+
+    def test_mixed(self, mocker):
+        assert isinstance(Mixed().get_plan().xpath, NodeScan)
+        assert isinstance(Page().get_plan().xpath, NodeScan)
+
+        extract = mocker.spy(Selector, 'extract')
+        assert {'title': 'Item', 'price': 1200, 'sku': 'ab-1', 'count': 3} == Mixed().parse(html)
+        assert 1 == extract.call_count
+
+        extract.reset_mock()
+        assert {'title': 'Item', 'item': self.expected} == Page().parse(html, exclude=['keys'])
+        assert 1 == extract.call_count
+
+        mixed = Mixed(xpath='//body')
+        assert {'title': 'Item', 'price': None, 'sku': None, 'count': 3} == mixed.parse(html)
+        assert Mixed(xpath='//section').parse(html) is None
+        assert [3] == [v['count'] for v in Mixed(xpath='//body', many=True).parse(html)]
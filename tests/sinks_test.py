@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+from datetime import date, datetime
+import gzip
+import io
+import json
+
+from dateutil.tz import tzoffset
+import pytest
+
+from scrapbook import Content, Element
+from scrapbook.filters import DateTime
+from scrapbook.parsers import All
+from scrapbook.sinks import CSVSink, JSONLinesSink
+
+
+html = u'''
+<html>
+    <body>
+        <div class="item">
+            <a href="/a">a</a><time>2017-01-02 03:04:05+09:00</time><b>1</b><i>x</i><i>y</i>
+        </div>
+        <div class="item"><a href="/b">日本語</a><time>2017-01-03</time></div>
+    </body>
+</html>
+'''
+
+
+class Item(Content):
+    url = Element(xpath='./a/@href')
+    name = Element(xpath='./a/text()')
+    published = Element(xpath='./time/text()', filter=DateTime())
+    day = Element(xpath='./time/text()', filter=DateTime(truncate_time=True))
+    tags = Element(xpath='./i/text()', parser=All(), filter=lambda v: v)
+    stock = Content.inline(count=Element(xpath='./b/text()', filter=int))
+
+
+item = Item(xpath='//div[@class="item"]', many=True)
+
+
+class TestJSONLinesSink(object):
+    def test_parse_to(self):
+        fp = io.BytesIO()
+        with JSONLinesSink(fp) as sink:
+            assert 2 == item.parse_to(html, sink)
+        assert 2 == sink.count
+
+        lines = fp.getvalue().decode('utf-8').splitlines()
+        assert {
+            'url': '/a',
+            'name': 'a',
+            'published': '2017-01-02T03:04:05+09:00',
+            'day': '2017-01-02',
+            'tags': ['x', 'y'],
+            'stock': {'count': 1},
+        } == json.loads(lines[0])
+        assert u'日本語' == json.loads(lines[1])['name']
+        assert {'count': None} == json.loads(lines[1])['stock']
+
+    def test_records(self):
+        fp = io.StringIO()
+        with JSONLinesSink(fp) as sink:
+            sink.write_many(item.parse(html, record_type='slots'))
+            sink.write(item.parse(html, lazy=True)[0])
+        lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+        assert lines[0] == lines[2]
+        assert {'count': 1} == lines[0]['stock']
+
+    def test_buffer(self):
+        class File(io.BytesIO):
+            writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                return super(File, self).write(data)
+
+        fp = File()
+        sink = JSONLinesSink(fp, buffer_size=30)
+        sink.write({'a': 1})
+        assert 0 == fp.writes
+        sink.write({'a': 'x' * 30})
+        assert 1 == fp.writes
+        sink.write({'a': 2})
+        sink.close()
+        assert 2 == fp.writes
+        assert 3 == len(fp.getvalue().splitlines())
+
+    def test_gzip(self, tmpdir):
+        path = str(tmpdir.join('items.jsonl.gz'))
+        with JSONLinesSink(path) as sink:
+            item.parse_to(html, sink)
+        with gzip.open(path, 'rb') as fp:
+            assert 2 == len(fp.read().splitlines())
+
+        fp = io.BytesIO()
+        with JSONLinesSink(fp, compress=True) as sink:
+            sink.write({'a': 1})
+        assert b'{"a":1}\n' == gzip.GzipFile(fileobj=io.BytesIO(fp.getvalue())).read()
+
+        with pytest.raises(ValueError):
+            JSONLinesSink(io.StringIO(), compress=True)
+
+    def test_not_serializable(self):
+        with pytest.raises(TypeError):
+            JSONLinesSink(io.BytesIO()).write({'a': object()})
+
+
+class TestCSVSink(object):
+    def test_parse_to(self, tmpdir):
+        path = str(tmpdir.join('items.csv'))
+        fields = ['url', 'name', 'published', 'day', 'tags', 'stock.count']
+        with CSVSink(path, fields=fields) as sink:
+            item.parse_to(html, sink)
+
+        with io.open(path, encoding='utf-8') as fp:
+            assert [
+                u'url,name,published,day,tags,stock.count',
+                u'/a,a,2017-01-02T03:04:05+09:00,2017-01-02,"[""x"", ""y""]",1',
+                u'/b,日本語,2017-01-03T00:00:00,2017-01-03,,',
+            ] == fp.read().splitlines()
+
+    def test_parse_to_missing_nested(self):
+        class Link(Content):
+            name = Element(xpath='./a/text()')
+            bold = Content.inline(xpath='./b', text=Element(xpath='./text()'))
+
+        def read(fp):
+            lines = [line.split(u',') for line in fp.getvalue().splitlines()]
+            return [dict(zip(lines[0], line)) for line in lines[1:]]
+
+        # The first record has no bold, the columns are those of the Content.
+        fp = io.StringIO()
+        with CSVSink(fp) as sink:
+            Link(xpath='//div[@class="item"][2]', many=True).parse_to(html, sink)
+            Link(xpath='//div[@class="item"]', many=True).parse_to(html, sink)
+        assert [
+            {'name': u'日本語', 'bold.text': u''},
+            {'name': u'a', 'bold.text': u'1'},
+            {'name': u'日本語', 'bold.text': u''},
+        ] == read(fp)
+
+    def test_fields(self):
+        fp = io.StringIO()
+        with CSVSink(fp, fields=['b', 'a'], header=False) as sink:
+            sink.write({'a': datetime(2017, 1, 2, tzinfo=tzoffset(None, 0))})
+            sink.write({'a': date(2017, 1, 2), 'b': True})
+        assert [u',2017-01-02T00:00:00+00:00', u'True,2017-01-02'] == fp.getvalue().splitlines()
+
+        with pytest.raises(ValueError):
+            CSVSink(io.StringIO(), fields=['a']).write({'a': 1, 'b': 2})
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import codecs
+import io
+import mmap
+import threading
+
+import pytest
+
+from scrapbook import Content, Document, Element
+from scrapbook.source import (
+    get_parser, load_selector, load_text, resolve_encoding, sniff_encoding,
+)
+
+
+html = u'<html><head><meta charset="{}"></head><body><p>日本語</p></body></html>'
+
+
+class Page(Content):
+    text = Element(xpath='//p/text()')
+
+
+class Heading(Content):
+    title = Element(xpath='//h1/text()')
+
+
+class TestSniffEncoding(object):
+    @pytest.mark.parametrize('head, expected', [
+        (b'<meta charset="shift_jis">', 'shift_jis'),
+        (b'<META http-equiv="Content-Type" content="text/html; charset=EUC-JP">', 'EUC-JP'),
+        (b'<meta charset="unknown">', None),
+        (b'<p>aaa</p>', None),
+    ])
+    def test_(self, head, expected):
+        assert expected == sniff_encoding(head)
+
+
+class TestResolveEncoding(object):
+    def test_(self):
+        assert 'utf-8' == resolve_encoding('utf-8')
+        assert 'euc-jp' == resolve_encoding('euc_jp')
+        assert resolve_encoding('unknown') is None
+
+
+class TestLoadSelector(object):
+    @pytest.mark.parametrize('encoding', ['utf-8', 'shift_jis', 'euc-jp'])
+    def test_bytes(self, encoding):
+        data = html.format(encoding).encode(encoding)
+        assert u'日本語' == load_selector(data).xpath('//p/text()').extract_first()
+
+    def test_encoding_hint(self):
+        data = u'<p>café</p>'.encode('cp1252')
+        assert u'café' == load_selector(data, 'cp1252').xpath('//p/text()').extract_first()
+
+    def test_encoding_unknown_to_libxml2(self):
+        data = u'<p>café</p>'.encode('mac-roman')
+        assert u'café' == load_selector(data, 'mac-roman').xpath('//p/text()').extract_first()
+
+    @pytest.mark.parametrize('bom, encoding', [
+        (codecs.BOM_UTF8, 'utf-8'),
+        (codecs.BOM_UTF16_LE, 'utf-16-le'),
+        (codecs.BOM_UTF16_BE, 'utf-16-be'),
+    ])
+    def test_bom(self, bom, encoding):
+        data = bom + u'<p>café</p>'.encode(encoding)
+        assert [u'café'] == load_selector(data, 'cp1252').xpath('//p/text()').extract()
+
+    def test_file(self, tmpdir):
+        path = tmpdir.join('page.html')
+        path.write_binary(html.format('shift_jis').encode('shift_jis'))
+
+        with path.open('rb') as fp:
+            assert u'日本語' == load_selector(fp).xpath('//p/text()').extract_first()
+        with io.open(str(path), encoding='shift_jis') as fp:
+            assert u'日本語' == load_selector(fp).xpath('//p/text()').extract_first()
+
+    def test_mmap(self, tmpdir, mocker):
+        mocker.patch('scrapbook.source.chunk_size', 16)
+        path = tmpdir.join('page.html')
+        path.write_binary(html.format('euc-jp').encode('euc-jp'))
+
+        with path.open('rb') as fp:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            assert u'日本語' == load_selector(buffer).xpath('//p/text()').extract_first()
+            buffer.close()
+
+    def test_undeclared(self, mocker):
+        mocker.patch('scrapbook.source.chunk_size', 4)
+        data = u'<p>日本語</p>'.encode('utf-8')
+        assert u'日本語' == load_selector(io.BytesIO(data)).xpath('//p/text()').extract_first()
+
+    def test_undeclared_invalid_utf8(self):
+        data = u'<h1>café</h1>'.encode('cp1252')
+        assert u'caf\ufffd' == load_selector(data).xpath('//h1/text()').extract_first()
+        assert {'title': u'caf\ufffd'} == Heading().parse(data)
+        assert load_text(data) == u'<h1>caf\ufffd</h1>'
+
+    def test_empty(self):
+        assert load_selector(b'').xpath('//p').extract_first() is None
+
+    def test_parser_per_thread(self):
+        parsers = []
+        thread = threading.Thread(target=lambda: parsers.append(get_parser('html', 'utf-8')))
+        thread.start()
+        thread.join()
+
+        assert get_parser('html', 'utf-8') is get_parser('html', 'utf-8')
+        assert get_parser('html', 'utf-8') is not parsers[0]
+
+
+class TestLoadText(object):
+    @pytest.mark.parametrize('encoding', ['utf-8', 'shift_jis', 'euc-jp'])
+    def test_bytes(self, encoding):
+        assert html.format(encoding) == load_text(html.format(encoding).encode(encoding))
+
+    def test_bom(self):
+        data = codecs.BOM_UTF16_LE + u'<p>café</p>'.encode('utf-16-le')
+        assert u'<p>café</p>' == load_text(data, 'cp1252')
+        assert u'<p>café</p>' == load_text(u'<p>café</p>'.encode('cp1252'), 'cp1252')
+
+    def test_file(self, tmpdir):
+        path = tmpdir.join('page.html')
+        path.write_binary(html.format('shift_jis').encode('shift_jis'))
+
+        assert html.format('shift_jis') == load_text(path)
+        with io.open(str(path), encoding='shift_jis') as fp:
+            assert html.format('shift_jis') == load_text(fp)
+
+
+class TestParse(object):
+    def test_bytes(self):
+        data = html.format('shift_jis').encode('shift_jis')
+        assert {'text': u'日本語'} == Page().parse(data)
+        assert {'text': u'日本語'} == Page().parse(data, encoding='shift_jis')
+        assert u'日本語' == Element(xpath='//p/text()').parse(data)
+        assert [{'text': u'日本語'}] == list(Page().iter_parse(data))
+
+    def test_document(self):
+        data = html.format('utf-8').encode('utf-8')
+        assert {'text': u'日本語'} == Page().parse(Document(data))
@@ -1,9 +1,37 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
+from array import array
+import math
+
 import pytest
 
-from scrapbook.utils import merge_dict, remove_tags
+from scrapbook import utils
+from scrapbook.utils import (
+    get_shape,
+    get_tzinfos,
+    int_typecode,
+    make_array,
+    merge_dict,
+    remove_tags,
+)
+
+
+class TestGetShape(object):
+    @pytest.mark.parametrize('value', [u'2017-01-02 Jan', b'2017-01-02 Jan'])
+    def test_(self, value):
+        assert u'0000-00-00 aaa' == get_shape(value)
+
+
+class TestTzinfos(object):
+    def test_(self):
+        from scrapbook.utils import tzinfos
+        assert tzinfos is get_tzinfos()
+        assert -5 * 3600 == tzinfos['EST']
+
+    def test_unknown_attribute(self):
+        with pytest.raises(AttributeError):
+            utils.unknown
 
 
 class TestMergeDict(object):
@@ -31,3 +59,23 @@ class TestRemoveTag(object):
     ])
     def test_(self, tag, text):
         assert text == remove_tags(tag)
+
+
+class TestMakeArray(object):
+    @pytest.mark.parametrize('values, expected', [
+        ([1, 2], array(int_typecode, [1, 2])),
+        ([True, False], array('b', [1, 0])),
+        ([1, 2.5], array('d', [1, 2.5])),
+        (['a', 1], ['a', 1]),
+        ([True, None], [True, None]),
+        ([None, None], [None, None]),
+        ([], []),
+        ([2 ** 70], [2 ** 70]),
+    ])
+    def test_(self, values, expected):
+        assert expected == make_array(values)
+
+    def test_with_none(self):
+        result = make_array([1, None])
+        assert 'd' == result.typecode
+        assert math.isnan(result[1])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function
+
+import pickle
+
+from lxml import etree
+from parsel import Selector
+import pytest
+
+from scrapbook.xpath import select, XPath, XPathCache
+
+
+class TestXPathCache(object):
+    def test_get(self):
+        cache = XPathCache()
+
+        xpath = cache.get('//p')
+        assert xpath is cache.get('//p')
+        assert xpath is not cache.get('//p', {'x': 'http://example.com/x'})
+        assert (1, 2, 1024, 2) == cache.info()
+
+    def test_evict(self):
+        cache = XPathCache(maxsize=2)
+
+        cache.get('//a')
+        cache.get('//b')
+        cache.get('//a')
+        cache.get('//c')
+
+        assert 2 == len(cache)
+        assert 1 == cache.hits
+        cache.get('//a')
+        assert 2 == cache.hits
+        cache.get('//b')
+        assert 4 == cache.misses
+
+    def test_clear(self):
+        cache = XPathCache()
+        cache.get('//a')
+        cache.clear()
+        assert (0, 0, 1024, 0) == cache.info()
+
+    def test_invalid_xpath(self):
+        with pytest.raises(ValueError):
+            XPathCache().get('//a[')
+
+
+class TestXPath(object):
+    def test_(self):
+        selector = Selector(u'<html><body><p>aaa</p><p>bbb</p></body></html>')
+        result = XPath('//p/text()')(selector)
+
+        assert ['aaa', 'bbb'] == result.extract()
+        assert ['//p/text()', '//p/text()'] == [s._expr for s in result]
+
+    def test_with_selector_list(self):
+        selector = Selector(u'<html><body><p><b>a</b></p><p><b>b</b></p></body></html>')
+        result = XPath('./b/text()')(selector.xpath('//p'))
+        assert ['a', 'b'] == result.extract()
+
+    def test_with_namespaces(self):
+        selector = Selector(
+            u'<root xmlns:x="http://example.com/x"><x:p>aaa</x:p></root>',
+            type='xml',
+        )
+        selector.register_namespace('x', 'http://example.com/x')
+        assert ['aaa'] == XPath('//x:p/text()')(selector).extract()
+
+    def test_select_with_variables(self):
+        selector = Selector(u'<html><body><p>aaa</p><p>bbb</p></body></html>')
+        assert 'bbb' == select(selector, '//p[$index]/text()', index=2).extract_first()
+
+    def test_first(self):
+        selector = Selector(u'<html><body><p>aaa</p><p>bbb</p><p>ccc</p></body></html>')
+        xpath = XPath('//p/text()', first=True)
+
+        result = xpath(selector)
+        assert ['aaa'] == result.extract()
+        assert ['//p/text()'] == [s._expr for s in result]
+        assert ['aaa', 'bbb', 'ccc'] == XPath('./text()', first=True)(
+            selector.xpath('//p')).extract()
+        assert [] == XPath('//a', first=True)(selector).extract()
+
+    def test_first_with_other_types(self):
+        selector = Selector(u'<html><body><p>aaa</p><p>bbb</p></body></html>')
+        assert ['2.0'] == XPath('count(//p)', first=True)(selector).extract()
+        assert ['aaa'] == XPath('string(//p)', first=True)(selector).extract()
+        assert ['bbb'] == XPath('//p[$index]/text()', first=True)(selector, index=2).extract()
+
+    def test_first_fallback(self, mocker):
+        selector = Selector(u'<html><body><p>aaa</p><p>bbb</p></body></html>')
+        xpath = XPath('//p/text()', first=True)
+        mocker.patch.object(xpath, '_xpath', side_effect=etree.XPathEvalError('Invalid type'))
+        assert ['aaa'] == xpath(selector).extract()
+
+    def test_pickle(self):
+        xpath = pickle.loads(pickle.dumps(XPath('//p', first=True)))
+        assert xpath.first
+        assert '//p' == xpath.expr